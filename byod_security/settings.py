@@ -103,6 +103,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # When switching to PostgreSQL, leave DISABLE_SERVER_SIDE_CURSORS at
+        # its default (False): the CSV exports rely on QuerySet.iterator()
+        # using server-side cursors to stream large result sets. Only set it
+        # to True behind transaction-pooling PgBouncer.
     }
 }
 
@@ -110,6 +114,14 @@ DATABASES = {
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
+# ProfileModelBackend is ModelBackend, but fetches the user's profile in the
+# same query. ModelBackend stays listed so sessions that stored it as their
+# backend keep authenticating; new logins go through the first entry.
+AUTHENTICATION_BACKENDS = [
+    'users.backends.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -195,6 +207,7 @@ CSP_IMG_SRC = ["'self'", "data:", "https:"]  # Prevent clickjacking
 
 # Session Security
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # Use database sessions for security
+SESSION_CACHE_ALIAS = 'default'
 SESSION_SERIALIZER = 'django.contrib.sessions.serializers.JSONSerializer'
 
 # Concurrent Session Prevention
@@ -213,6 +226,17 @@ CACHES = {
     }
 }
 
+# With a cache every worker shares (Redis/Memcached), serve session reads from
+# it: cached_db still writes every change through to django_session. A
+# per-process cache would keep a session ended in one worker alive in the
+# others, so those stay on plain database sessions.
+_PER_PROCESS_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+if CACHES[SESSION_CACHE_ALIAS]['BACKEND'] not in _PER_PROCESS_CACHE_BACKENDS:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
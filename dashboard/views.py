@@ -68,7 +68,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         recent_violations = SessionTracker.objects.filter(
             status='violation',
             login_time__date__gte=week_ago
-        ).select_related('user', 'device').order_by('-login_time')[:5]
+        ).select_related('user', 'device').defer('violation_details').order_by('-login_time')[:5]
         
         # Get pending access requests for admins
         pending_requests = DeviceAccessRequest.objects.filter(
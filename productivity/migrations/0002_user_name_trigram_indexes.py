@@ -0,0 +1,47 @@
+# Generated migration to add trigram indexes for the user_filter lookups
+
+from django.conf import settings
+from django.db import migrations
+
+
+TRIGRAM_COLUMNS = ('username', 'first_name', 'last_name')
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """
+    Back the user_filter ``__icontains`` lookups with pg_trgm GIN indexes
+    so ILIKE '%x%' no longer forces a sequential scan of auth_user.
+    Trigram indexes are PostgreSQL-only; other backends are left untouched.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm;')
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS auth_user_{column}_trgm '
+            f'ON auth_user USING gin ({column} gin_trgm_ops);'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    """
+    Reverse migration - drop the trigram indexes (the extension is kept).
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS auth_user_{column}_trgm;')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('productivity', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
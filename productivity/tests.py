@@ -4,6 +4,7 @@ from django.urls import reverse
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import datetime, timedelta, date
+import csv
 import json
 
 from .models import ActivityLog, PerformanceReport
@@ -314,7 +315,8 @@ class ProductivityViewsTest(TestCase):
             device_type='laptop',
             mac_address='00:11:22:33:44:55',
             operating_system='windows',
-            user=self.user
+            user=self.user,
+            registered_by=self.user
         )
         
         # Create sample activity logs
@@ -364,6 +366,48 @@ class ProductivityViewsTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'text/csv')
         self.assertIn('attachment', response['Content-Disposition'])
+
+    def test_export_csv_activity_logs_rows(self):
+        """Test CSV export writes one formatted row per activity log."""
+        ActivityLog.objects.filter(user=self.user).update(
+            resources_accessed='["https://example.com", "https://test.com"]'
+        )
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('productivity:export_csv') + '?export_type=activity_logs')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        
+        self.assertEqual(rows[0][3], 'Activity Type')
+        self.assertEqual(len(rows), 6)  # header + 5 logs
+        for row in rows[1:]:
+            self.assertEqual(row[1:6], [
+                'testuser', 'Test Device', 'Web Browsing', '60.0',
+                'https://example.com, https://test.com'
+            ])
+    
+    def test_export_csv_reports_rows(self):
+        """Test CSV export writes one formatted row per report."""
+        PerformanceReport.objects.create(
+            user=self.user,
+            report_type='daily',
+            report_date=date(2024, 1, 15),
+            start_date=date(2024, 1, 15),
+            end_date=date(2024, 1, 15),
+            productivity_score=75.0,
+            attendance_percentage=90.0,
+            total_active_time=timedelta(hours=6),
+            total_idle_time=timedelta(minutes=30),
+            login_count=3,
+            devices_used=1
+        )
+        
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('productivity:export_csv') + '?export_type=reports')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        
+        self.assertEqual(len(rows), 2)  # header + 1 report
+        self.assertEqual(rows[1][:9], [
+            'testuser', 'Daily Report', '2024-01-15', '75.0', '90.0', '6.0', '0.5', '3', '1'
+        ])
     
     def test_export_csv_reports(self):
         """Test CSV export for reports."""
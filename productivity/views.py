@@ -1,4 +1,5 @@
 import csv
+import json
 from datetime import datetime, timedelta
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
@@ -8,13 +9,85 @@ from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView
 from django.core.paginator import Paginator
 from django.db.models import Q, Sum, Count, Avg
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.contrib.auth.models import User
 from .models import ActivityLog, PerformanceReport
 from devices.models import Device
 
 
+# Columns rendered by the activity log list template
+ACTIVITY_LIST_FIELDS = (
+    'id', 'timestamp', 'activity_type', 'duration', 'resources_accessed',
+    'user__id', 'user__username', 'user__first_name', 'user__last_name',
+    'device__id', 'device__name', 'device__device_type',
+)
+
+
+def _can_view_all_users(user):
+    """
+    Teachers and admins can see every user's productivity data.
+    """
+    return hasattr(user, 'profile') and (user.profile.is_teacher or user.profile.is_admin)
+
+
+def _activity_log_base(list_columns_only):
+    """
+    Return a fresh base queryset for activity log listings.
+    """
+    queryset = ActivityLog.objects.select_related('user', 'device')
+    if list_columns_only:
+        queryset = queryset.only(*ACTIVITY_LIST_FIELDS)
+    return queryset
+
+
+def filter_activity_logs(queryset, request):
+    """
+    Apply the activity log GET filters shared by the list view and CSV export.
+    """
+    params = request.GET
+    
+    # Date filtering
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    
+    if start_date:
+        try:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+            queryset = queryset.filter(timestamp__date__gte=start_date)
+        except ValueError:
+            pass
+    
+    if end_date:
+        try:
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+            queryset = queryset.filter(timestamp__date__lte=end_date)
+        except ValueError:
+            pass
+    
+    # Activity type filtering
+    activity_type = params.get('activity_type', '').strip()
+    if activity_type:
+        queryset = queryset.filter(activity_type=activity_type)
+    
+    # User filtering (for teachers/admins)
+    if _can_view_all_users(request.user):
+        user_filter = params.get('user_filter', '').strip()
+        if user_filter:
+            queryset = queryset.filter(
+                Q(user__username__icontains=user_filter) |
+                Q(user__first_name__icontains=user_filter) |
+                Q(user__last_name__icontains=user_filter)
+            )
+    
+    # Device filtering
+    device_filter = params.get('device_filter', '').strip()
+    if device_filter:
+        queryset = queryset.filter(device__name__icontains=device_filter)
+    
+    return queryset.order_by('-timestamp')
+
+
 class ActivityLogListView(LoginRequiredMixin, ListView):
     """
     List view for activity logs with pagination and filtering.
@@ -26,62 +99,25 @@ class ActivityLogListView(LoginRequiredMixin, ListView):
     paginate_by = 20
     
     def get_queryset(self):
+        """
+        Return the filtered queryset, building it at most once per request.
+        """
+        if not hasattr(self, '_cached_qs'):
+            self._cached_qs = self._build_queryset()
+        return self._cached_qs
+    
+    def _build_queryset(self):
         """
         Return activity logs based on user role and filtering options.
         """
         user = self.request.user
         
-        # Base queryset depends on user role
-        if hasattr(user, 'profile'):
-            if user.profile.is_teacher or user.profile.is_admin:
-                # Teachers and admins can see all activity logs
-                queryset = ActivityLog.objects.all().select_related('user', 'device')
-            else:
-                # Students can only see their own activity logs
-                queryset = ActivityLog.objects.filter(user=user).select_related('user', 'device')
-        else:
-            # Default to user's own logs if no profile
-            queryset = ActivityLog.objects.filter(user=user).select_related('user', 'device')
+        # Teachers and admins can see all activity logs, everyone else only their own
+        queryset = _activity_log_base(list_columns_only=True)
+        if not _can_view_all_users(user):
+            queryset = queryset.filter(user=user)
         
-        # Date filtering
-        start_date = self.request.GET.get('start_date')
-        end_date = self.request.GET.get('end_date')
-        
-        if start_date:
-            try:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(timestamp__date__gte=start_date)
-            except ValueError:
-                pass
-        
-        if end_date:
-            try:
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(timestamp__date__lte=end_date)
-            except ValueError:
-                pass
-        
-        # Activity type filtering
-        activity_type = self.request.GET.get('activity_type', '').strip()
-        if activity_type:
-            queryset = queryset.filter(activity_type=activity_type)
-        
-        # User filtering (for teachers/admins)
-        if hasattr(user, 'profile') and (user.profile.is_teacher or user.profile.is_admin):
-            user_filter = self.request.GET.get('user_filter', '').strip()
-            if user_filter:
-                queryset = queryset.filter(
-                    Q(user__username__icontains=user_filter) |
-                    Q(user__first_name__icontains=user_filter) |
-                    Q(user__last_name__icontains=user_filter)
-                )
-        
-        # Device filtering
-        device_filter = self.request.GET.get('device_filter', '').strip()
-        if device_filter:
-            queryset = queryset.filter(device__name__icontains=device_filter)
-        
-        return queryset.order_by('-timestamp')
+        return filter_activity_logs(queryset, self.request)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -130,6 +166,14 @@ class ReportsView(LoginRequiredMixin, ListView):
     paginate_by = 10
     
     def get_queryset(self):
+        """
+        Return the filtered queryset, building it at most once per request.
+        """
+        if not hasattr(self, '_cached_qs'):
+            self._cached_qs = self._build_queryset()
+        return self._cached_qs
+    
+    def _build_queryset(self):
         """
         Return performance reports based on user role and filtering.
         """
@@ -201,42 +245,56 @@ class ReportsView(LoginRequiredMixin, ListView):
             (user.profile.is_teacher or user.profile.is_admin)
         )
         
-        # Add summary statistics
-        queryset = self.get_queryset()
-        if queryset.exists():
-            context['avg_productivity_score'] = queryset.aggregate(
-                avg=Avg('productivity_score')
-            )['avg'] or 0
-            context['avg_attendance'] = queryset.aggregate(
-                avg=Avg('attendance_percentage')
-            )['avg'] or 0
-            context['total_reports'] = queryset.count()
-        else:
-            context['avg_productivity_score'] = 0
-            context['avg_attendance'] = 0
-            context['total_reports'] = 0
+        # Add summary statistics in a single aggregate query, reusing the
+        # queryset ListView already built instead of rebuilding it
+        summary = self.object_list.aggregate(
+            avg_prod=Avg('productivity_score'),
+            avg_att=Avg('attendance_percentage'),
+            total=Count('id')
+        )
+        context['avg_productivity_score'] = summary['avg_prod'] or 0
+        context['avg_attendance'] = summary['avg_att'] or 0
+        context['total_reports'] = summary['total']
         
         return context
 
 
+class _Echo:
+    """
+    File-like object whose write() returns the value, so csv.writer can
+    produce rows for a StreamingHttpResponse.
+    """
+    
+    def write(self, value):
+        return value
+
+
 class ExportCSVView(LoginRequiredMixin, ListView):
     """
     View for exporting activity logs and reports to CSV format.
     """
     
+    # Maps export_type query values to exporter method names
+    EXPORT_HANDLERS = {
+        'activity_logs': 'export_activity_logs',
+        'reports': 'export_reports',
+    }
+    
     def get(self, request, *args, **kwargs):
         """
         Handle CSV export based on export_type parameter.
         """
         export_type = request.GET.get('export_type', 'activity_logs')
         
-        if export_type == 'activity_logs':
-            return self.export_activity_logs()
-        elif export_type == 'reports':
-            return self.export_reports()
-        else:
+        handler = getattr(self, self.EXPORT_HANDLERS.get(export_type, ''), None)
+        if handler is None:
             messages.error(request, 'Invalid export type specified.')
             return redirect('productivity:reports')
+        
+        response = handler()
+        # Let an upstream cache serve identical exports repeated in a short window
+        response['Cache-Control'] = 'private, max-age=30'
+        return response
     
     def export_activity_logs(self):
         """
@@ -245,36 +303,38 @@ class ExportCSVView(LoginRequiredMixin, ListView):
         user = self.request.user
         
         # Get queryset based on user permissions
-        if hasattr(user, 'profile') and (user.profile.is_teacher or user.profile.is_admin):
-            queryset = ActivityLog.objects.all().select_related('user', 'device')
-        else:
-            queryset = ActivityLog.objects.filter(user=user).select_related('user', 'device')
+        queryset = _activity_log_base(list_columns_only=False)
+        if not _can_view_all_users(user):
+            queryset = queryset.filter(user=user)
         
         # Apply same filters as ActivityLogListView
         queryset = self.apply_activity_filters(queryset)
         
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="activity_logs_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
+        header = [
             'Timestamp', 'User', 'Device', 'Activity Type', 
             'Duration (minutes)', 'Resources Accessed', 'IP Address'
-        ])
-        
-        for log in queryset:
-            writer.writerow([
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.user.username,
-                log.device.name,
-                log.get_activity_type_display(),
-                round(log.duration_minutes, 2),
-                ', '.join(log.get_resources_list()) if log.get_resources_list() else '',
-                log.ip_address or ''
-            ])
-        
-        return response
+        ]
+        
+        # Only scalar columns are needed, so skip model instantiation entirely
+        act_map = dict(ActivityLog.ACTIVITY_TYPE_CHOICES)
+        rows = queryset.values_list(
+            'timestamp', 'user__username', 'device__name', 'activity_type',
+            'duration', 'resources_accessed', 'ip_address'
+        ).iterator(chunk_size=5000)
+        
+        def generate_rows():
+            for timestamp, username, device_name, activity_type, duration, resources, ip_address in rows:
+                yield [
+                    timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+                    username,
+                    device_name,
+                    act_map.get(activity_type, activity_type),
+                    round(duration.total_seconds() / 60, 2),
+                    ', '.join(self._parse_resources(resources)),
+                    ip_address or ''
+                ]
+        
+        return self._stream_csv('activity_logs', header, generate_rows())
     
     def export_reports(self):
         """
@@ -291,72 +351,70 @@ class ExportCSVView(LoginRequiredMixin, ListView):
         # Apply same filters as ReportsView
         queryset = self.apply_report_filters(queryset)
         
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="performance_reports_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
+        header = [
             'User', 'Report Type', 'Report Date', 'Productivity Score', 
             'Attendance %', 'Active Time (hours)', 'Idle Time (hours)', 
             'Login Count', 'Devices Used', 'Generated At'
-        ])
-        
-        for report in queryset:
-            writer.writerow([
-                report.user.username,
-                report.get_report_type_display(),
-                report.report_date.strftime('%Y-%m-%d'),
-                round(report.productivity_score, 2),
-                round(report.attendance_percentage, 2),
-                round(report.active_time_hours, 2),
-                round(report.idle_time_hours, 2),
-                report.login_count,
-                report.devices_used,
-                report.generated_at.strftime('%Y-%m-%d %H:%M:%S')
-            ])
+        ]
+        
+        report_map = dict(PerformanceReport.REPORT_TYPE_CHOICES)
+        rows = queryset.values_list(
+            'user__username', 'report_type', 'report_date', 'productivity_score',
+            'attendance_percentage', 'total_active_time', 'total_idle_time',
+            'login_count', 'devices_used', 'generated_at'
+        ).iterator(chunk_size=5000)
+        
+        def generate_rows():
+            for (username, report_type, report_date, productivity_score, attendance,
+                 active_time, idle_time, login_count, devices_used, generated_at) in rows:
+                yield [
+                    username,
+                    report_map.get(report_type, report_type),
+                    report_date.strftime('%Y-%m-%d'),
+                    round(productivity_score, 2),
+                    round(attendance, 2),
+                    round(active_time.total_seconds() / 3600, 2),
+                    round(idle_time.total_seconds() / 3600, 2),
+                    login_count,
+                    devices_used,
+                    generated_at.strftime('%Y-%m-%d %H:%M:%S')
+                ]
+        
+        return self._stream_csv('performance_reports', header, generate_rows())
+    
+    def _stream_csv(self, filename_prefix, header, rows):
+        """
+        Build a StreamingHttpResponse that writes CSV rows as they are read.
+        """
+        writer = csv.writer(_Echo())
         
+        def stream():
+            yield writer.writerow(header)
+            for row in rows:
+                yield writer.writerow(row)
+        
+        response = StreamingHttpResponse(stream(), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename_prefix}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
         return response
     
+    @staticmethod
+    def _parse_resources(resources_accessed):
+        """
+        Parse a raw resources_accessed value the same way as
+        ActivityLog.get_resources_list().
+        """
+        if not resources_accessed:
+            return []
+        try:
+            return json.loads(resources_accessed)
+        except json.JSONDecodeError:
+            return []
+    
     def apply_activity_filters(self, queryset):
         """
         Apply the same filters as ActivityLogListView.
         """
-        # Date filtering
-        start_date = self.request.GET.get('start_date')
-        end_date = self.request.GET.get('end_date')
-        
-        if start_date:
-            try:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(timestamp__date__gte=start_date)
-            except ValueError:
-                pass
-        
-        if end_date:
-            try:
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(timestamp__date__lte=end_date)
-            except ValueError:
-                pass
-        
-        # Activity type filtering
-        activity_type = self.request.GET.get('activity_type', '').strip()
-        if activity_type:
-            queryset = queryset.filter(activity_type=activity_type)
-        
-        # User filtering (for teachers/admins)
-        user = self.request.user
-        if hasattr(user, 'profile') and (user.profile.is_teacher or user.profile.is_admin):
-            user_filter = self.request.GET.get('user_filter', '').strip()
-            if user_filter:
-                queryset = queryset.filter(
-                    Q(user__username__icontains=user_filter) |
-                    Q(user__first_name__icontains=user_filter) |
-                    Q(user__last_name__icontains=user_filter)
-                )
-        
-        return queryset.order_by('-timestamp')
+        return filter_activity_logs(queryset, self.request)
     
     def apply_report_filters(self, queryset):
         """
@@ -1,6 +1,10 @@
 from django.contrib import admin
+from django.db.models import DateTimeField, DurationField, ExpressionWrapper, F
+from django.db.models.functions import Coalesce, Now
+from django.utils import timezone
 from django.utils.html import format_html
 from .models import AccessControl, SessionTracker
+from .session_utils import SessionManager
 
 
 @admin.register(AccessControl)
@@ -49,6 +53,7 @@ class SessionTrackerAdmin(admin.ModelAdmin):
     list_filter = ['status', 'login_time', 'device__device_type', 'violation_count']
     search_fields = ['user__username', 'device__name', 'ip_address', 'session_key']
     readonly_fields = ['login_time', 'duration_display', 'time_since_last_activity_display']
+    list_select_related = ('user', 'device')
     date_hierarchy = 'login_time'
     
     fieldsets = (
@@ -67,11 +72,26 @@ class SessionTrackerAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        """
+        Annotate duration and idle time so the changelist computes them in SQL.
+        """
+        return super().get_queryset(request).annotate(
+            _duration=ExpressionWrapper(
+                Coalesce('logout_time', Now(), output_field=DateTimeField()) - F('login_time'),
+                output_field=DurationField()
+            ),
+            _since_last=ExpressionWrapper(
+                Now() - F('last_activity'),
+                output_field=DurationField()
+            ),
+        )
+    
     def duration_display(self, obj):
         """
         Display session duration in a readable format.
         """
-        duration = obj.duration
+        duration = getattr(obj, '_duration', None) or obj.duration
         hours, remainder = divmod(duration.total_seconds(), 3600)
         minutes, seconds = divmod(remainder, 60)
         return f"{int(hours):02d}:{int(minutes):02d}:{int(seconds):02d}"
@@ -81,13 +101,14 @@ class SessionTrackerAdmin(admin.ModelAdmin):
         """
         Display time since last activity in a readable format.
         """
-        time_diff = obj.time_since_last_activity
-        if time_diff.total_seconds() < 60:
-            return f"{int(time_diff.total_seconds())} seconds ago"
-        elif time_diff.total_seconds() < 3600:
-            return f"{int(time_diff.total_seconds() // 60)} minutes ago"
+        time_diff = getattr(obj, '_since_last', None) or obj.time_since_last_activity
+        seconds = int(time_diff.total_seconds())
+        if seconds < 60:
+            return f"{seconds} seconds ago"
+        elif seconds < 3600:
+            return f"{seconds // 60} minutes ago"
         else:
-            return f"{int(time_diff.total_seconds() // 3600)} hours ago"
+            return f"{seconds // 3600} hours ago"
     time_since_last_activity_display.short_description = 'Last Activity'
     
     actions = ['end_selected_sessions', 'mark_as_violation']
@@ -96,10 +117,18 @@ class SessionTrackerAdmin(admin.ModelAdmin):
         """
         End selected active sessions.
         """
-        count = 0
-        for session in queryset.filter(status='active'):
-            session.end_session('admin_action')
-            count += 1
+        active_sessions = queryset.filter(status='active')
+        session_keys = list(active_sessions.values_list('session_key', flat=True))
+        
+        # Single UPDATE with the same effect as end_session('admin_action')
+        count = active_sessions.update(
+            status='inactive',
+            logout_time=timezone.now()
+        )
+        
+        # The middleware and cache-backed session engines would otherwise
+        # keep treating these sessions as active until their copies expire
+        SessionManager.evict_cached_sessions(session_keys)
         
         self.message_user(request, f'Successfully ended {count} sessions.')
     end_selected_sessions.short_description = 'End selected sessions'
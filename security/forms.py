@@ -1,10 +1,76 @@
-import json
+import functools
+import re
 from django import forms
 from django.core.exceptions import ValidationError
-from .models import AccessControl, SessionTracker, validate_json_list, validate_time_restrictions
+from .models import AccessControl, SessionTracker
 from .validators import SecurityValidator
 
 
+# Domain validation tables, built once at import.
+# Input is lowercased before validation, so only lowercase letters are accepted.
+_DOMAIN_CHARS = frozenset('abcdefghijklmnopqrstuvwxyz0123456789.-')
+_MAX_LABEL_LENGTH = 63
+# A line holding exactly one valid domain: 3-253 characters, no '--',
+# labels of 1-63 alphanumerics with inner hyphens only, at least two labels
+_DOMAIN_LINE_RE = re.compile(
+    r'^[^\S\n]*'
+    r'((?=[a-z0-9.-]{3,253}[^\S\n]*$)(?![a-z0-9.-]*--)'
+    r'[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?(?:\.[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?)+)'
+    r'[^\S\n]*$',
+    re.MULTILINE
+)
+# Administrative, malicious, phishing and local-address terms, plus bare IPv4 addresses
+_SUSPICIOUS_RE = re.compile(
+    r'(admin|root|system|test|hack|crack|exploit|malware|phish|scam|fraud|localhost|127\.0\.0\.1)'
+    r'|^\d+\.\d+\.\d+\.\d+$',
+    re.IGNORECASE
+)
+_SUSPICIOUS_TLDS = ('.tk', '.ml', '.ga', '.cf', '.bit')
+# Characters that can only appear in URLs, paths or credentials, never in a hostname
+_NON_HOSTNAME_CHARS = frozenset('/\\ @?#:')
+
+
+@functools.lru_cache(maxsize=4096)
+def _is_valid_domain(domain):
+    """
+    Enhanced domain validation. Expects an already lowercased domain.
+    
+    Pure function of its input, so results are memoized per process.
+    """
+    # Cheap structural checks first: length, URL/path characters,
+    # consecutive dots or hyphens
+    if len(domain) > 253 or len(domain) < 3:
+        return False
+    if not _NON_HOSTNAME_CHARS.isdisjoint(domain):
+        return False
+    if '..' in domain or '--' in domain:
+        return False
+    
+    # Only letters, digits, dots and hyphens, checked in one C-level pass
+    if not _DOMAIN_CHARS.issuperset(domain):
+        return False
+    
+    # No empty labels and no hyphen at either end of a label
+    if domain[0] in '.-' or domain[-1] in '.-' or '.-' in domain or '-.' in domain:
+        return False
+    
+    # Require at least a name and a TLD, with labels of at most 63 characters
+    labels = domain.split('.')
+    return len(labels) >= 2 and max(map(len, labels)) <= _MAX_LABEL_LENGTH
+
+
+@functools.lru_cache(maxsize=4096)
+def _is_suspicious_domain(domain):
+    """
+    Check for suspicious domain patterns.
+    """
+    if _SUSPICIOUS_RE.search(domain):
+        return True
+    
+    # Check for suspicious TLDs (basic list)
+    return domain.endswith(_SUSPICIOUS_TLDS)
+
+
 class AccessControlForm(forms.ModelForm):
     """
     Form for creating and editing access control rules.
@@ -101,57 +167,65 @@ class AccessControlForm(forms.ModelForm):
         """
         Clean and validate allowed domains list.
         """
-        domains_text = self.cleaned_data.get('allowed_domains_list', '')
-        if not domains_text.strip():
-            return []
-        
-        # Sanitize input
-        domains_text = SecurityValidator.sanitize_text_input(domains_text, max_length=5000)
-        domains = [domain.strip() for domain in domains_text.split('\n') if domain.strip()]
-        
-        # Enhanced domain validation
-        validated_domains = []
-        for domain in domains:
-            # Sanitize each domain
-            domain = SecurityValidator.sanitize_text_input(domain, max_length=253)
-            
-            # Validate domain format
-            if not self._is_valid_domain(domain):
-                raise ValidationError(f'Invalid domain format: {domain}')
-            
-            # Check for suspicious patterns
-            if self._is_suspicious_domain(domain):
-                raise ValidationError(f'Suspicious domain detected: {domain}')
-            
-            validated_domains.append(domain.lower())
-        
-        return validated_domains
+        return self._clean_domain_list(
+            self.cleaned_data.get('allowed_domains_list', ''), check_suspicious=True
+        )
     
     def clean_blocked_domains_list(self):
         """
         Clean and validate blocked domains list.
         """
-        domains_text = self.cleaned_data.get('blocked_domains_list', '')
-        if not domains_text.strip():
+        return self._clean_domain_list(
+            self.cleaned_data.get('blocked_domains_list', ''), check_suspicious=False
+        )
+    
+    def _clean_domain_list(self, domains_text, check_suspicious):
+        """
+        Parse one-domain-per-line input into a lowercased, de-duplicated list.
+        """
+        if not domains_text or domains_text.isspace():
             return []
         
-        # Sanitize input
+        # Sanitize the whole input once
         domains_text = SecurityValidator.sanitize_text_input(domains_text, max_length=5000)
-        domains = [domain.strip() for domain in domains_text.split('\n') if domain.strip()]
         
-        # Enhanced domain validation
-        validated_domains = []
-        for domain in domains:
-            # Sanitize each domain
-            domain = SecurityValidator.sanitize_text_input(domain, max_length=253)
-            
-            # Validate domain format
-            if not self._is_valid_domain(domain):
-                raise ValidationError(f'Invalid domain format: {domain}')
-            
-            validated_domains.append(domain.lower())
+        # Fast path: one regex sweep extracts every well-formed domain. A matched
+        # line holds exactly one whitespace-separated token, so equal counts
+        # mean no non-blank line was rejected.
+        lowered = domains_text.lower()
+        validated_domains = _DOMAIN_LINE_RE.findall(lowered)
+        if len(validated_domains) == len(lowered.split()):
+            errors = []
+            if check_suspicious:
+                errors = [
+                    f'Suspicious domain detected: {domain}'
+                    for domain in validated_domains
+                    if _is_suspicious_domain(domain)
+                ]
+        else:
+            # Slow path: walk the lines to report every problem at once
+            validated_domains = []
+            errors = []
+            for line in domains_text.splitlines():
+                if not (domain := line.strip().lower()):
+                    continue
+                
+                # Validate domain format
+                if not _is_valid_domain(domain):
+                    errors.append(f'Invalid domain format: {domain}')
+                
+                # Check for suspicious patterns
+                elif check_suspicious and _is_suspicious_domain(domain):
+                    errors.append(f'Suspicious domain detected: {domain}')
+                
+                else:
+                    validated_domains.append(domain)
+        
+        if errors:
+            raise ValidationError(errors)
         
-        return validated_domains
+        # Drop duplicates while preserving order
+        return list(dict.fromkeys(validated_domains))
     
     def clean(self):
         """
@@ -176,7 +250,10 @@ class AccessControlForm(forms.ModelForm):
         blocked_domains = cleaned_data.get('blocked_domains_list', [])
         
         if allowed_domains and blocked_domains:
-            conflicts = set(allowed_domains) & set(blocked_domains)
+            # Hash only the larger list and walk the smaller one
+            smaller, larger = sorted((allowed_domains, blocked_domains), key=len)
+            larger = set(larger)
+            conflicts = [domain for domain in smaller if domain in larger]
             if conflicts:
                 raise ValidationError(f'Domains cannot be both allowed and blocked: {", ".join(conflicts)}')
         
@@ -215,72 +292,15 @@ class AccessControlForm(forms.ModelForm):
             instance.save()
         
         return instance
-    
-    def _is_valid_domain(self, domain):
-        """
-        Enhanced domain validation.
-        """
-        import re
-        
-        # Basic domain pattern (simplified)
-        domain_pattern = r'^[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?(\.[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?)*$'
-        
-        if not re.match(domain_pattern, domain):
-            return False
-        
-        # Check length
-        if len(domain) > 253:
-            return False
-        
-        # Check for valid TLD
-        parts = domain.split('.')
-        if len(parts) < 2:
-            return False
-        
-        # Check for consecutive dots or hyphens
-        if '..' in domain or '--' in domain:
-            return False
-        
-        # Check for domains starting or ending with hyphen
-        if domain.startswith('-') or domain.endswith('-'):
-            return False
-        
-        return True
-    
-    def _is_suspicious_domain(self, domain):
-        """
-        Check for suspicious domain patterns.
-        """
-        import re
-        
-        # Suspicious patterns
-        suspicious_patterns = [
-            r'(admin|root|system|test)',  # Administrative terms
-            r'(hack|crack|exploit|malware)',  # Malicious terms
-            r'(phish|scam|fraud)',  # Phishing terms
-            r'^\d+\.\d+\.\d+\.\d+$',  # IP addresses
-            r'(localhost|127\.0\.0\.1)',  # Local addresses
-        ]
-        
-        for pattern in suspicious_patterns:
-            if re.search(pattern, domain, re.IGNORECASE):
-                return True
-        
-        # Check for suspicious TLDs (basic list)
-        suspicious_tlds = ['.tk', '.ml', '.ga', '.cf', '.bit']
-        for tld in suspicious_tlds:
-            if domain.endswith(tld):
-                return True
-        
-        return False
 
 
 class SessionFilterForm(forms.Form):
     """
     Form for filtering session data.
     """
+    # Evaluated once with the class body; STATUS_CHOICES is a static tuple
     status = forms.ChoiceField(
-        choices=[('', 'All Statuses')] + list(SessionTracker.STATUS_CHOICES),
+        choices=(('', 'All Statuses'),) + SessionTracker.STATUS_CHOICES,
         required=False,
         widget=forms.Select(attrs={'class': 'form-select'})
     )
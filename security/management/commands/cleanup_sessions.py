@@ -21,6 +21,13 @@ class Command(BaseCommand):
             help='Session timeout in minutes (default: 30)'
         )
         
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SessionManager.CLEANUP_BATCH_SIZE,
+            help=f'Maximum rows deleted per transaction (default: {SessionManager.CLEANUP_BATCH_SIZE})'
+        )
+        
         parser.add_argument(
             '--dry-run',
             action='store_true',
@@ -35,9 +42,13 @@ class Command(BaseCommand):
     
     def handle(self, *args, **options):
         timeout_minutes = options['timeout']
+        batch_size = options['batch_size']
         dry_run = options['dry_run']
         verbose = options['verbose']
         
+        if batch_size < 1:
+            raise CommandError('--batch-size must be a positive integer')
+        
         self.stdout.write(
             self.style.SUCCESS(f'Starting session cleanup (timeout: {timeout_minutes} minutes)')
         )
@@ -55,16 +66,22 @@ class Command(BaseCommand):
                 from security.models import SessionTracker
                 from django.contrib.sessions.models import Session
                 
-                cutoff_time = timezone.now() - timedelta(minutes=timeout_minutes)
+                # One timestamp for both filters keeps the cutoffs consistent
+                now = timezone.now()
+                cutoff_time = now - timedelta(minutes=timeout_minutes)
                 
-                expired_trackers = SessionTracker.objects.filter(
+                # Probe with EXISTS first so an empty hot set costs a single
+                # index lookup; only count when there is something to count
+                expired_qs = SessionTracker.objects.filter(
                     status='active',
                     last_activity__lt=cutoff_time
-                ).count()
+                )
+                expired_trackers = expired_qs.count() if expired_qs.exists() else 0
                 
-                orphaned_sessions = Session.objects.filter(
-                    expire_date__lt=timezone.now()
-                ).count()
+                orphaned_qs = Session.objects.filter(
+                    expire_date__lt=now
+                )
+                orphaned_sessions = orphaned_qs.count() if orphaned_qs.exists() else 0
                 
                 stats = {
                     'expired_session_trackers': expired_trackers,
@@ -75,7 +92,7 @@ class Command(BaseCommand):
                 self.stdout.write('DRY RUN RESULTS:')
             else:
                 # Perform actual cleanup
-                stats = SessionManager.cleanup_expired_sessions(timeout_minutes)
+                stats = SessionManager.cleanup_expired_sessions(timeout_minutes, batch_size=batch_size)
             
             if 'error' in stats:
                 raise CommandError(f'Cleanup failed: {stats["error"]}')
@@ -7,17 +7,23 @@ access control enforcement, and security monitoring.
 
 import json
 import logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from dataclasses import dataclass
 from datetime import timedelta
 from django.conf import settings
 from django.contrib.auth import logout
 from django.contrib.sessions.models import Session
-from django.core.cache import cache
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError
 from django.http import HttpResponseForbidden, JsonResponse
 from django.shortcuts import redirect
-from django.urls import reverse
+from django.urls import reverse_lazy
 from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
-from .models import SessionTracker, AccessControl
+from .models import SessionTracker, AccessControl, TimeRestrictions, forget_cached_trackers, tracker_cache_key
 from .session_utils import SessionManager, SessionSecurityMonitor
 from devices.models import Device
 
@@ -25,6 +31,128 @@ from devices.models import Device
 logger = logging.getLogger(__name__)
 
 
+# Resolved on first use instead of at import, when the URLconf may not be loaded
+_LOGIN_URL = reverse_lazy('users:login')
+
+# Warm sessions are served from a cached copy of their tracker row
+TRACKER_CACHE_TIMEOUT = 60  # seconds
+# Every column the middleware reads; the free-form user_agent is left deferred
+_TRACKER_FIELDS = tuple(
+    field.attname for field in SessionTracker._meta.concrete_fields
+    if field.attname != 'user_agent'
+)
+
+# Asset and crawler paths that skip session and access checks outright,
+# before any per-middleware exemption or authentication lookup
+_SKIP_ALL = ('/static/', '/media/', '/favicon.ico', '/robots.txt')
+
+
+def _get_client_ip(request):
+    """
+    Get the client's IP address, extracted once per request.
+    """
+    try:
+        return request._client_ip
+    except AttributeError:
+        pass
+    
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        ip = x_forwarded_for.split(',')[0]
+    else:
+        ip = request.META.get('REMOTE_ADDR')
+    request._client_ip = ip
+    return ip
+
+
+def _get_user_agent(request):
+    """
+    Get the client's user agent string, extracted once per request.
+    """
+    try:
+        return request._user_agent
+    except AttributeError:
+        pass
+    
+    user_agent = request.META.get('HTTP_USER_AGENT', '')
+    request._user_agent = user_agent
+    return user_agent
+
+
+def _is_ajax_request(request):
+    """
+    Check if request is an AJAX request, evaluated once per request.
+    """
+    try:
+        return request._is_ajax
+    except AttributeError:
+        pass
+    
+    meta = request.META
+    is_ajax = (
+        meta.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest' or
+        request.content_type == 'application/json' or
+        'application/json' in meta.get('HTTP_ACCEPT', '')
+    )
+    request._is_ajax = is_ajax
+    return is_ajax
+
+
+def _cache_is_shared():
+    """
+    Whether the default cache is seen by every worker process.
+    
+    A per-process cache cannot be told about sessions started or ended by
+    another worker, so entries that go stale when that happens must not be
+    kept there.
+    """
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def _cache_session_tracker(session_tracker):
+    """
+    Store the tracker's column values (not the model instance) in cache.
+    
+    Only a shared cache is used: a per-process copy could not be dropped
+    when the session is ended from another worker process.
+    """
+    if not _cache_is_shared():
+        return
+    values = tuple(getattr(session_tracker, name) for name in _TRACKER_FIELDS)
+    cache.set(tracker_cache_key(session_tracker.session_key), values, timeout=TRACKER_CACHE_TIMEOUT)
+
+
+def _activity_cache_key(tracker_id):
+    return f"sess_last:{tracker_id}"
+
+
+def _sole_session_cache_key(user_id):
+    return f"sess_sole:{user_id}"
+
+
+def _forget_session_tracker(session_key):
+    """
+    Drop a tracker from cache once its session has ended.
+    """
+    forget_cached_trackers([session_key])
+
+
+def _queue_violation(request, session_tracker, violation_type, details):
+    """
+    Queue a violation to be saved with the others raised by this request.
+    
+    SessionValidationMiddleware opens the queue once it has a tracker and
+    flushes it in process_response; without a queue the violation is saved
+    immediately.
+    """
+    pending = getattr(request, '_pending_violations', None)
+    if pending is None:
+        session_tracker.add_violation(violation_type, details)
+        _cache_session_tracker(session_tracker)
+    else:
+        pending.append((violation_type, details))
+
+
 class SessionValidationMiddleware(MiddlewareMixin):
     """
     Middleware for session validation, activity tracking, and timeout management.
@@ -38,21 +166,40 @@ class SessionValidationMiddleware(MiddlewareMixin):
     
     # Session timeout in minutes (configurable via settings)
     SESSION_TIMEOUT = getattr(settings, 'SESSION_TIMEOUT_MINUTES', 30)
+    SESSION_TIMEOUT_DELTA = timedelta(minutes=SESSION_TIMEOUT)
     
-    # URLs that don't require session validation
-    EXEMPT_URLS = [
+    # Persist last_activity at most this often; in between it is kept in cache
+    ACTIVITY_WRITE_INTERVAL = 60  # seconds
+    
+    # Run suspicious-activity detection at most this often per session
+    SUSPICIOUS_CHECK_INTERVAL = 60  # seconds
+    
+    # Suspicious responses are counted in cache and recorded as a violation
+    # once THRESHOLD of the same status occur within WINDOW seconds
+    SUSPICIOUS_RESPONSE_CODES = frozenset((403, 404, 500))
+    SUSPICIOUS_RESPONSE_THRESHOLD = 5
+    SUSPICIOUS_RESPONSE_WINDOW = 300  # seconds
+    
+    # Paths browsers and crawlers request on their own; 404s there are noise
+    NOISE_PATHS = ('/favicon.ico', '/robots.txt', '/apple-touch-icon')
+    
+    # URLs that don't require session validation (a tuple, matched in one startswith call)
+    EXEMPT_URLS = (
         '/auth/login/',
         '/auth/logout/',
         '/auth/signup/',
         '/admin/',
         '/static/',
         '/media/',
-    ]
+    )
     
     def process_request(self, request):
         """
         Process incoming requests for session validation and activity tracking.
         """
+        if request.path.startswith(_SKIP_ALL):
+            return None
+        
         # Skip validation for exempt URLs
         if self._is_exempt_url(request.path):
             return None
@@ -66,6 +213,9 @@ class SessionValidationMiddleware(MiddlewareMixin):
         if not session_tracker:
             return None
         
+        # Violations raised while handling this request are saved together
+        request._pending_violations = []
+        
         # Check for session timeout
         if self._is_session_expired(session_tracker):
             return self._handle_session_timeout(request, session_tracker)
@@ -86,22 +236,44 @@ class SessionValidationMiddleware(MiddlewareMixin):
         """
         Process responses to log additional activity data.
         """
-        # Skip processing for exempt URLs or unauthenticated users
-        if (self._is_exempt_url(request.path) or 
-            not request.user.is_authenticated):
+        if request.path.startswith(_SKIP_ALL):
             return response
         
-        # Log response status for security monitoring
-        if hasattr(request, 'session_tracker'):
+        # Log response status for security monitoring, skipping exempt URLs
+        # and users who are (or have just been) logged out
+        if (not self._is_exempt_url(request.path) and
+                request.user.is_authenticated and
+                hasattr(request, 'session_tracker')):
             self._log_response_activity(request, response)
         
+        self._flush_violations(request)
         return response
     
+    def _flush_violations(self, request):
+        """
+        Save the violations queued during this request in one write.
+        """
+        pending = getattr(request, '_pending_violations', None)
+        if not pending:
+            return
+        
+        request._pending_violations = []
+        session_tracker = request.session_tracker
+        try:
+            session_tracker.add_violations(pending)
+        except (DatabaseError, ValidationError) as e:
+            logger.error("Error saving session violations: %s", e)
+            return
+        
+        # A session ended by this request has already been dropped from cache
+        if session_tracker.status == 'active':
+            _cache_session_tracker(session_tracker)
+    
     def _is_exempt_url(self, path):
         """
         Check if URL is exempt from session validation.
         """
-        return any(path.startswith(exempt) for exempt in self.EXEMPT_URLS)
+        return path.startswith(self.EXEMPT_URLS)
     
     def _get_or_create_session_tracker(self, request):
         """
@@ -109,10 +281,7 @@ class SessionValidationMiddleware(MiddlewareMixin):
         """
         try:
             # Try to get existing session tracker
-            session_tracker = SessionTracker.objects.select_related('user', 'device').get(
-                session_key=request.session.session_key,
-                status='active'
-            )
+            session_tracker = self._get_tracker_cached(request)
             
             # Store in request for later use
             request.session_tracker = session_tracker
@@ -121,55 +290,95 @@ class SessionValidationMiddleware(MiddlewareMixin):
         except SessionTracker.DoesNotExist:
             # Create new session tracker if this is a new session
             return self._create_new_session_tracker(request)
-        except Exception as e:
-            logger.error(f"Error getting session tracker: {e}")
+        except (DatabaseError, ValidationError) as e:
+            logger.error("Error getting session tracker: %s", e)
             return None
     
+    def _get_tracker_cached(self, request):
+        """
+        Get the active tracker for this session, from cache when warm.
+        
+        A cache hit rebuilds the instance from the cached column values without
+        a query; a miss reads only those columns, without joins. Either way the
+        user is attached from the request and the device loads lazily if
+        anything needs it.
+        """
+        session_key = request.session.session_key
+        values = cache.get(tracker_cache_key(session_key)) if _cache_is_shared() else None
+        
+        if values is not None:
+            session_tracker = SessionTracker.from_db(SessionTracker.objects.db, _TRACKER_FIELDS, values)
+        else:
+            session_tracker = SessionTracker.objects.only(*_TRACKER_FIELDS).get(
+                session_key=session_key,
+                status='active'
+            )
+            _cache_session_tracker(session_tracker)
+        
+        if session_tracker.user_id == request.user.pk:
+            session_tracker.user = request.user
+        return session_tracker
+    
     def _create_new_session_tracker(self, request):
         """
         Create a new session tracker for the current session.
         """
         try:
             # Get user's primary device or create a default one
-            device = self._get_user_device(request)
-            if not device:
+            device_id = self._get_user_device_id(request)
+            if not device_id:
                 return None
             
             # Create session tracker
             session_tracker = SessionTracker.objects.create(
                 user=request.user,
-                device=device,
+                device_id=device_id,
                 session_key=request.session.session_key,
                 ip_address=self._get_client_ip(request),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
+                user_agent=_get_user_agent(request)[:500],
                 status='active'
             )
             
             request.session_tracker = session_tracker
-            logger.info(f"Created new session tracker for user {request.user.username}")
+            _cache_session_tracker(session_tracker)
+            cache.delete(_sole_session_cache_key(request.user.id))
+            logger.info("Created new session tracker for user %s", request.user.username)
             return session_tracker
             
-        except Exception as e:
-            logger.error(f"Error creating session tracker: {e}")
+        except (DatabaseError, ValidationError) as e:
+            logger.error("Error creating session tracker: %s", e)
             return None
     
-    def _get_user_device(self, request):
+    def _get_user_device_id(self, request):
         """
-        Get the user's device for session tracking.
+        Get the id of the user's device for session tracking.
+        
+        Only ids are fetched; device ownership is cached for an hour so a
+        session's device is not re-checked against the database each time.
         """
         try:
             # Try to get device from session or user's primary device
             device_id = request.session.get('device_id')
             if device_id:
-                return Device.objects.get(id=device_id, user=request.user)
+                owner_key = f"device_owner:{device_id}"
+                owner_id = cache.get(owner_key)
+                if owner_id is None:
+                    owner_id = Device.objects.filter(id=device_id).values_list('user_id', flat=True).first()
+                    if owner_id is not None:
+                        cache.set(owner_key, owner_id, timeout=3600)
+                
+                if owner_id != request.user.id:
+                    raise Device.DoesNotExist(f"Device {device_id} does not belong to user {request.user.id}")
+                return device_id
             
             # Get user's first registered device
-            device = Device.objects.filter(user=request.user).first()
-            if device:
-                request.session['device_id'] = device.id
-                return device
+            device_id = Device.objects.filter(user=request.user).values_list('id', flat=True).first()
+            if device_id:
+                request.session['device_id'] = device_id
+                cache.set(f"device_owner:{device_id}", request.user.id, timeout=3600)
+                return device_id
             
-            # Create a default device if none exists
+            # Create a default device if none exists (once per user)
             return Device.objects.create(
                 user=request.user,
                 name=f"Default Device - {request.user.username}",
@@ -177,22 +386,17 @@ class SessionValidationMiddleware(MiddlewareMixin):
                 mac_address='00:00:00:00:00:00',  # Placeholder MAC
                 operating_system='Unknown',
                 compliance_status=False
-            )
+            ).id
             
-        except Exception as e:
-            logger.error(f"Error getting user device: {e}")
+        except (Device.DoesNotExist, DatabaseError, ValidationError) as e:
+            logger.error("Error getting user device: %s", e)
             return None
     
     def _get_client_ip(self, request):
         """
         Get the client's IP address from request.
         """
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return _get_client_ip(request)
     
     def _is_session_expired(self, session_tracker):
         """
@@ -201,23 +405,39 @@ class SessionValidationMiddleware(MiddlewareMixin):
         if not session_tracker:
             return False
         
-        inactive_duration = timezone.now() - session_tracker.last_activity
-        return inactive_duration.total_seconds() > (self.SESSION_TIMEOUT * 60)
+        # Prefer the cached activity time, which may be newer than the stored one
+        last_activity = cache.get(_activity_cache_key(session_tracker.id)) or session_tracker.last_activity
+        inactive_duration = timezone.now() - last_activity
+        return inactive_duration > self.SESSION_TIMEOUT_DELTA
     
     def _has_concurrent_sessions(self, user, current_session_key):
         """
         Check if user has concurrent active sessions using SessionManager.
         """
         try:
+            # Only the negative answer is cached: the key of a session known to
+            # be the user's sole active one. A tracker created by this middleware
+            # clears it, but only a shared cache carries that to other workers,
+            # so with a per-process cache every call goes to the database.
+            # Trackers created elsewhere can still go unseen until the entry
+            # expires (TRACKER_CACHE_TIMEOUT).
+            shared = _cache_is_shared()
+            cache_key = _sole_session_cache_key(user.id)
+            if shared and current_session_key and cache.get(cache_key) == current_session_key:
+                return False
+            
             # Use SessionManager for more sophisticated concurrent session handling
             active_sessions = SessionManager.get_active_sessions_for_user(user).exclude(
                 session_key=current_session_key
             )
             
-            return active_sessions.exists()
+            has_concurrent = active_sessions.exists()
+            if shared and not has_concurrent:
+                cache.set(cache_key, current_session_key, timeout=TRACKER_CACHE_TIMEOUT)
+            return has_concurrent
             
-        except Exception as e:
-            logger.error(f"Error checking concurrent sessions: {e}")
+        except DatabaseError as e:
+            logger.error("Error checking concurrent sessions: %s", e)
             return False
     
     def _handle_session_timeout(self, request, session_tracker):
@@ -227,9 +447,10 @@ class SessionValidationMiddleware(MiddlewareMixin):
         try:
             # End the session tracker
             session_tracker.end_session('timeout')
+            _forget_session_tracker(session_tracker.session_key)
             
             # Log the timeout event
-            logger.info(f"Session timeout for user {request.user.username}")
+            logger.info("Session timeout for user %s", request.user.username)
             
             # Logout user and redirect to login
             logout(request)
@@ -238,13 +459,13 @@ class SessionValidationMiddleware(MiddlewareMixin):
             if self._is_ajax_request(request):
                 return JsonResponse({
                     'error': 'Session expired',
-                    'redirect': reverse('users:login')
+                    'redirect': _LOGIN_URL
                 }, status=401)
             else:
-                return redirect('users:login')
+                return redirect(_LOGIN_URL)
                 
-        except Exception as e:
-            logger.error(f"Error handling session timeout: {e}")
+        except (DatabaseError, ValidationError) as e:
+            logger.error("Error handling session timeout: %s", e)
             return None
     
     def _handle_concurrent_session(self, request, session_tracker):
@@ -263,7 +484,9 @@ class SessionValidationMiddleware(MiddlewareMixin):
                 return None
             
             # Session not allowed - handle based on policy
-            session_tracker.add_violation(
+            _queue_violation(
+                request,
+                session_tracker,
                 'concurrent_session',
                 {'message': message}
             )
@@ -277,9 +500,10 @@ class SessionValidationMiddleware(MiddlewareMixin):
             
             # End the current session
             session_tracker.end_session('violation')
+            _forget_session_tracker(session_tracker.session_key)
             
             # Log the violation
-            logger.warning(f"Concurrent session denied for user {request.user.username}: {message}")
+            logger.warning("Concurrent session denied for user %s: %s", request.user.username, message)
             
             # Logout user
             logout(request)
@@ -288,13 +512,13 @@ class SessionValidationMiddleware(MiddlewareMixin):
             if self._is_ajax_request(request):
                 return JsonResponse({
                     'error': message,
-                    'redirect': reverse('users:login')
+                    'redirect': _LOGIN_URL
                 }, status=403)
             else:
-                return redirect('users:login')
+                return redirect(_LOGIN_URL)
                 
-        except Exception as e:
-            logger.error(f"Error handling concurrent session: {e}")
+        except (DatabaseError, ValidationError) as e:
+            logger.error("Error handling concurrent session: %s", e)
             return None
     
     def _update_activity_tracking(self, request, session_tracker):
@@ -302,21 +526,27 @@ class SessionValidationMiddleware(MiddlewareMixin):
         Update session activity tracking.
         """
         try:
-            # Update last activity timestamp
-            session_tracker.update_activity()
-            
-            # Cache activity data for performance
-            cache_key = f"user_activity_{request.user.id}"
+            # Only write last_activity through to the database once the stored
+            # value is ACTIVITY_WRITE_INTERVAL old; every hit is recorded in cache
+            now = timezone.now()
+            if (now - session_tracker.last_activity).total_seconds() > self.ACTIVITY_WRITE_INTERVAL:
+                session_tracker.update_activity()
+                _cache_session_tracker(session_tracker)
+            
+            # Cache the hit and activity data for performance, in one round trip
             activity_data = {
-                'last_seen': timezone.now().isoformat(),
+                'last_seen': now.isoformat(),
                 'path': request.path,
                 'method': request.method,
                 'ip_address': self._get_client_ip(request)
             }
-            cache.set(cache_key, activity_data, timeout=300)  # 5 minutes
+            cache.set_many({
+                _activity_cache_key(session_tracker.id): now,
+                f"user_activity_{request.user.id}": activity_data,
+            }, timeout=300)  # 5 minutes
             
-        except Exception as e:
-            logger.error(f"Error updating activity tracking: {e}")
+        except (DatabaseError, ValidationError) as e:
+            logger.error("Error updating activity tracking: %s", e)
     
     def _log_response_activity(self, request, response):
         """
@@ -324,56 +554,96 @@ class SessionValidationMiddleware(MiddlewareMixin):
         """
         try:
             # Log suspicious response codes
-            if response.status_code in [403, 404, 500]:
-                session_tracker = request.session_tracker
-                session_tracker.add_violation(
-                    'suspicious_response',
-                    {
-                        'status_code': response.status_code,
-                        'path': request.path,
-                        'method': request.method
-                    }
-                )
+            status_code = response.status_code
+            if status_code not in self.SUSPICIOUS_RESPONSE_CODES:
+                return
+            if status_code == 404 and request.path.startswith(self.NOISE_PATHS):
+                return
+            
+            session_tracker = request.session_tracker
+            counter_key = f"violations:{session_tracker.id}:{status_code}"
+            cache.add(counter_key, 0, timeout=self.SUSPICIOUS_RESPONSE_WINDOW)
+            try:
+                count = cache.incr(counter_key)
+            except ValueError:
+                # The counter expired between add() and incr()
+                count = 1
+                cache.set(counter_key, count, timeout=self.SUSPICIOUS_RESPONSE_WINDOW)
+            
+            if count < self.SUSPICIOUS_RESPONSE_THRESHOLD:
+                return
+            
+            # Threshold reached: record one violation and start a new window
+            cache.delete(counter_key)
+            _queue_violation(
+                request,
+                session_tracker,
+                'suspicious_response',
+                {
+                    'status_code': status_code,
+                    'path': request.path,
+                    'method': request.method,
+                    'count': count
+                }
+            )
                 
-        except Exception as e:
-            logger.error(f"Error logging response activity: {e}")
+        except (DatabaseError, ValidationError) as e:
+            logger.error("Error logging response activity: %s", e)
     
     def _monitor_suspicious_activity(self, request, session_tracker):
         """
         Monitor session for suspicious activity patterns.
         """
         try:
+            # cache.add only succeeds when the key is absent, so this acts as a
+            # per-session token that lets one request through each interval
+            if not cache.add(f"sess_monitor:{session_tracker.id}", True,
+                             timeout=self.SUSPICIOUS_CHECK_INTERVAL):
+                return
+            
             suspicious_activities = SessionSecurityMonitor.detect_suspicious_activity(session_tracker)
             
             if suspicious_activities:
                 # Log suspicious activities
                 for activity in suspicious_activities:
-                    session_tracker.add_violation(
+                    _queue_violation(
+                        request,
+                        session_tracker,
                         activity,
                         {
                             'detected_at': timezone.now().isoformat(),
                             'path': request.path,
-                            'user_agent': request.META.get('HTTP_USER_AGENT', '')[:200]
+                            'user_agent': _get_user_agent(request)[:200]
                         }
                     )
                 
                 logger.warning(
-                    f"Suspicious activity detected for user {request.user.username}: "
-                    f"{', '.join(suspicious_activities)}"
+                    "Suspicious activity detected for user %s: %s",
+                    request.user.username, ', '.join(suspicious_activities)
                 )
                 
-        except Exception as e:
-            logger.error(f"Error monitoring suspicious activity: {e}")
+        except (DatabaseError, ValidationError) as e:
+            logger.error("Error monitoring suspicious activity: %s", e)
     
     def _is_ajax_request(self, request):
         """
         Check if request is an AJAX request (replacement for deprecated is_ajax()).
         """
-        return (
-            request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest' or
-            request.content_type == 'application/json' or
-            'application/json' in request.META.get('HTTP_ACCEPT', '')
-        )
+        return _is_ajax_request(request)
+
+
+@dataclass(frozen=True)
+class _AccessRules:
+    """
+    Snapshot of an AccessControl rule's fields used by the middleware.
+    
+    Rebuilt from a plain dict on cache hits, so no model instance is pickled.
+    """
+    role: str
+    time_restrictions: TimeRestrictions
+    
+    def is_time_allowed(self, current_time=None):
+        return self.time_restrictions.allows(current_time)
 
 
 class AccessControlMiddleware(MiddlewareMixin):
@@ -387,8 +657,8 @@ class AccessControlMiddleware(MiddlewareMixin):
     - Logs access violations
     """
     
-    # URLs that don't require access control
-    EXEMPT_URLS = [
+    # URLs that don't require access control (a tuple, matched in one startswith call)
+    EXEMPT_URLS = (
         '/auth/',
         '/admin/',
         '/static/',
@@ -401,7 +671,7 @@ class AccessControlMiddleware(MiddlewareMixin):
         '/ready/',
         '/alive/',
         '/stats/',
-    ]
+    )
     
     # Cache timeout for access control rules (in seconds)
     CACHE_TIMEOUT = 300  # 5 minutes
@@ -410,6 +680,9 @@ class AccessControlMiddleware(MiddlewareMixin):
         """
         Process requests to enforce access control rules.
         """
+        if request.path.startswith(_SKIP_ALL):
+            return None
+        
         # Skip access control for exempt URLs
         if self._is_exempt_url(request.path):
             return None
@@ -437,7 +710,7 @@ class AccessControlMiddleware(MiddlewareMixin):
         """
         Check if URL is exempt from access control.
         """
-        return any(path.startswith(exempt) for exempt in self.EXEMPT_URLS)
+        return path.startswith(self.EXEMPT_URLS)
     
     def _get_user_access_rules(self, user):
         """
@@ -450,27 +723,43 @@ class AccessControlMiddleware(MiddlewareMixin):
             
             user_role = user.profile.role
             
-            # Try to get from cache first
-            cache_key = f"access_rules_{user_role}"
-            access_rules = cache.get(cache_key)
+            # Try to get from cache first (bump the version whenever the
+            # cached format changes, so stale entries are never unpickled)
+            cache_key = f"access_rules:v2:{user_role}"
+            rule_data = cache.get(cache_key)
             
-            if access_rules is None:
+            if rule_data is None:
                 # Get from database
                 try:
-                    access_rules = AccessControl.objects.get(
+                    access_control = AccessControl.objects.get(
                         role=user_role,
                         is_active=True
                     )
-                    # Cache the rules
-                    cache.set(cache_key, access_rules, timeout=self.CACHE_TIMEOUT)
+                    # Days and times are prepared once here, not on every request
+                    time_restrictions = access_control.get_compiled_time_restrictions()
                 except AccessControl.DoesNotExist:
-                    # No specific rules for this role, allow all access
-                    return None
+                    # No specific rules for this role; cache the miss as well
+                    rule_data = {}
+                except (KeyError, TypeError, AttributeError, ValueError) as e:
+                    # Malformed restrictions should not lock users out
+                    logger.error("Error preparing time restrictions: %s", e)
+                    rule_data = {}
+                else:
+                    # Cache the rules as a plain dict rather than a model instance
+                    rule_data = {
+                        'role': access_control.role,
+                        'time_restrictions': time_restrictions,
+                    }
+                cache.set(cache_key, rule_data, timeout=self.CACHE_TIMEOUT)
+            
+            if not rule_data:
+                # No specific rules for this role, allow all access
+                return None
             
-            return access_rules
+            return _AccessRules(**rule_data)
             
-        except Exception as e:
-            logger.error(f"Error getting access rules: {e}")
+        except DatabaseError as e:
+            logger.error("Error getting access rules: %s", e)
             return None
     
     def _is_time_allowed(self, access_rules):
@@ -479,8 +768,9 @@ class AccessControlMiddleware(MiddlewareMixin):
         """
         try:
             return access_rules.is_time_allowed()
-        except Exception as e:
-            logger.error(f"Error checking time restrictions: {e}")
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            # Malformed restrictions (e.g. non-string times) should not lock users out
+            logger.error("Error checking time restrictions: %s", e)
             return True  # Allow access if check fails
     
     def _is_resource_allowed(self, request, access_rules):
@@ -488,97 +778,77 @@ class AccessControlMiddleware(MiddlewareMixin):
         Check if the requested resource is allowed based on access rules.
         This should only apply to external domain requests, not internal app URLs.
         """
-        try:
-            # For now, we'll only control external domain access
-            # Internal application URLs should always be allowed
-            # This middleware is primarily for controlling external web access
-            
-            # Check if this is an external domain request
-            # (This would be implemented when we add proxy/filtering functionality)
-            
-            # For internal application URLs, always allow access
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error checking resource access: {e}")
-            return True  # Allow access if check fails
+        # For now, we'll only control external domain access
+        # Internal application URLs should always be allowed
+        # This middleware is primarily for controlling external web access
+        
+        # Check if this is an external domain request
+        # (This would be implemented when we add proxy/filtering functionality)
+        
+        # For internal application URLs, always allow access
+        return True
     
     def _extract_resource_from_request(self, request):
         """
         Extract resource/domain information from request.
         """
-        try:
-            # For now, we'll use the URL path as the resource
-            # In a more advanced implementation, this could parse
-            # actual domain requests or API endpoints
-            path = request.path.strip('/')
-            
-            # Extract the main app/resource from URL
-            if path:
-                resource_parts = path.split('/')
-                if resource_parts:
-                    return resource_parts[0]  # First part of URL path
-            
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error extracting resource: {e}")
-            return None
+        # For now, we'll use the URL path as the resource
+        # In a more advanced implementation, this could parse
+        # actual domain requests or API endpoints
+        path = request.path.strip('/')
+        
+        # Extract the main app/resource from URL
+        if path:
+            resource_parts = path.split('/')
+            if resource_parts:
+                return resource_parts[0]  # First part of URL path
+        
+        return None
     
     def _handle_time_restriction_violation(self, request, access_rules):
         """
         Handle time-based access restriction violations.
         """
-        try:
-            # Log the violation
-            self._log_access_violation(
-                request,
-                'time_restriction',
-                f"Access outside allowed time for role {access_rules.role}"
+        # Log the violation
+        self._log_access_violation(
+            request,
+            'time_restriction',
+            f"Access outside allowed time for role {access_rules.role}"
+        )
+        
+        # Return forbidden response
+        if self._is_ajax_request(request):
+            return JsonResponse({
+                'error': 'Access not allowed at this time',
+                'message': 'Your role has time-based access restrictions'
+            }, status=403)
+        else:
+            return HttpResponseForbidden(
+                "Access not allowed at this time. Your role has time-based restrictions."
             )
-            
-            # Return forbidden response
-            if self._is_ajax_request(request):
-                return JsonResponse({
-                    'error': 'Access not allowed at this time',
-                    'message': 'Your role has time-based access restrictions'
-                }, status=403)
-            else:
-                return HttpResponseForbidden(
-                    "Access not allowed at this time. Your role has time-based restrictions."
-                )
-                
-        except Exception as e:
-            logger.error(f"Error handling time restriction violation: {e}")
-            return None
     
     def _handle_resource_restriction_violation(self, request, access_rules):
         """
         Handle resource access restriction violations.
         """
-        try:
-            # Log the violation
-            resource = self._extract_resource_from_request(request)
-            self._log_access_violation(
-                request,
-                'resource_restriction',
-                f"Access to restricted resource '{resource}' for role {access_rules.role}"
+        # Log the violation
+        resource = self._extract_resource_from_request(request)
+        self._log_access_violation(
+            request,
+            'resource_restriction',
+            f"Access to restricted resource '{resource}' for role {access_rules.role}"
+        )
+        
+        # Return forbidden response
+        if self._is_ajax_request(request):
+            return JsonResponse({
+                'error': 'Access to this resource is not allowed',
+                'message': 'Your role does not have permission to access this resource'
+            }, status=403)
+        else:
+            return HttpResponseForbidden(
+                "Access to this resource is not allowed for your role."
             )
-            
-            # Return forbidden response
-            if self._is_ajax_request(request):
-                return JsonResponse({
-                    'error': 'Access to this resource is not allowed',
-                    'message': 'Your role does not have permission to access this resource'
-                }, status=403)
-            else:
-                return HttpResponseForbidden(
-                    "Access to this resource is not allowed for your role."
-                )
-                
-        except Exception as e:
-            logger.error(f"Error handling resource restriction violation: {e}")
-            return None
     
     def _log_access_violation(self, request, violation_type, details):
         """
@@ -587,80 +857,78 @@ class AccessControlMiddleware(MiddlewareMixin):
         try:
             # Get session tracker if available
             if hasattr(request, 'session_tracker') and request.session_tracker:
-                request.session_tracker.add_violation(
+                _queue_violation(
+                    request,
+                    request.session_tracker,
                     violation_type,
                     {
                         'details': details,
                         'path': request.path,
                         'method': request.method,
                         'ip_address': self._get_client_ip(request),
-                        'user_agent': request.META.get('HTTP_USER_AGENT', '')[:200]
+                        'user_agent': _get_user_agent(request)[:200]
                     }
                 )
             
             # Also log to Django logger
-            logger.warning(f"Access violation: {details} - User: {request.user.username}")
+            logger.warning("Access violation: %s - User: %s", details, request.user.username)
             
-        except Exception as e:
-            logger.error(f"Error logging access violation: {e}")
+        except (DatabaseError, ValidationError) as e:
+            logger.error("Error logging access violation: %s", e)
     
     def _get_client_ip(self, request):
         """
         Get the client's IP address from request.
         """
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return _get_client_ip(request)
     
     def _is_ajax_request(self, request):
         """
         Check if request is an AJAX request (replacement for deprecated is_ajax()).
         """
-        return (
-            request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest' or
-            request.content_type == 'application/json' or
-            'application/json' in request.META.get('HTTP_ACCEPT', '')
-        )
+        return _is_ajax_request(request)
 
 
-class SecurityHeadersMiddleware(MiddlewareMixin):
+class SecurityHeadersMiddleware:
     """
     Middleware to add security headers to responses.
     
     This middleware adds various security headers to enhance application security.
+    
+    It never touches the database or cache, so it is written as a plain
+    sync/async middleware: under ASGI it awaits the response directly instead
+    of running process_response in a worker thread as MiddlewareMixin would.
     """
     
-    def process_response(self, request, response):
-        """
-        Add security headers to response.
-        """
+    sync_capable = True
+    async_capable = True
+    
+    # Header values never change, so they are built once at class load
+    SECURITY_HEADERS = (
         # Content Security Policy
-        response['Content-Security-Policy'] = (
+        ('Content-Security-Policy', (
             "default-src 'self'; "
             "script-src 'self' 'unsafe-inline' https://cdn.tailwindcss.com; "
             "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; "
             "font-src 'self' https://fonts.gstatic.com; "
             "img-src 'self' data:; "
             "connect-src 'self';"
-        )
+        )),
         
         # X-Frame-Options (prevent clickjacking)
-        response['X-Frame-Options'] = 'DENY'
+        ('X-Frame-Options', 'DENY'),
         
         # X-Content-Type-Options (prevent MIME sniffing)
-        response['X-Content-Type-Options'] = 'nosniff'
+        ('X-Content-Type-Options', 'nosniff'),
         
         # X-XSS-Protection
-        response['X-XSS-Protection'] = '1; mode=block'
+        ('X-XSS-Protection', '1; mode=block'),
         
         # Referrer Policy
-        response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
+        ('Referrer-Policy', 'strict-origin-when-cross-origin'),
         
         # Permissions Policy
-        response['Permissions-Policy'] = (
+        ('Permissions-Policy', (
             "geolocation=(), "
             "microphone=(), "
             "camera=(), "
@@ -669,6 +937,29 @@ class SecurityHeadersMiddleware(MiddlewareMixin):
             "magnetometer=(), "
             "gyroscope=(), "
             "speaker=()"
-        )
+        )),
+    )
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+    
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+    
+    def process_response(self, request, response):
+        """
+        Add security headers to response.
+        """
+        headers = response.headers
+        for name, value in self.SECURITY_HEADERS:
+            headers[name] = value
         
-        return response
\ No newline at end of file
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sessiontracker',
+            index=models.Index(fields=['status', 'last_activity'], name='sess_status_lastact_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 08:01
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0002_sessiontracker_status_last_activity_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='sessiontracker',
+            name='security_se_session_81020c_idx',
+        ),
+    ]
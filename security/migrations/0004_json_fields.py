@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-16 09:30
+
+import json
+
+from django.db import migrations, models
+
+
+def normalize_json_text(apps, schema_editor):
+    """
+    Rewrite blank or malformed JSON text as the field default, so every row
+    can be converted to the JSON column type (e.g. cast to jsonb).
+    """
+    AccessControl = apps.get_model('security', 'AccessControl')
+    SessionTracker = apps.get_model('security', 'SessionTracker')
+    
+    def normalized(text, expected_type):
+        try:
+            data = json.loads(text) if text else None
+        except ValueError:
+            data = None
+        return text if isinstance(data, expected_type) else json.dumps(expected_type())
+    
+    json_fields = (
+        ('allowed_domains', list),
+        ('blocked_domains', list),
+        ('time_restrictions', dict),
+    )
+    for rule in AccessControl.objects.only(*(name for name, _ in json_fields)):
+        changes = {}
+        for name, expected_type in json_fields:
+            text = getattr(rule, name)
+            fixed = normalized(text, expected_type)
+            if fixed != text:
+                changes[name] = fixed
+        if changes:
+            AccessControl.objects.filter(pk=rule.pk).update(**changes)
+    
+    # Most sessions never record a violation, so the blank ones go in one UPDATE
+    SessionTracker.objects.filter(violation_details='').update(violation_details='[]')
+    for tracker_id, text in SessionTracker.objects.exclude(
+        violation_details='[]'
+    ).values_list('id', 'violation_details').iterator():
+        fixed = normalized(text, list)
+        if fixed != text:
+            SessionTracker.objects.filter(pk=tracker_id).update(violation_details=fixed)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0003_remove_redundant_session_key_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_json_text, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='accesscontrol',
+            name='allowed_domains',
+            field=models.JSONField(blank=True, default=list, help_text='JSON list of allowed domains for this role'),
+        ),
+        migrations.AlterField(
+            model_name='accesscontrol',
+            name='blocked_domains',
+            field=models.JSONField(blank=True, default=list, help_text='JSON list of blocked domains for this role'),
+        ),
+        migrations.AlterField(
+            model_name='accesscontrol',
+            name='time_restrictions',
+            field=models.JSONField(blank=True, default=dict, help_text='JSON object with time-based access restrictions'),
+        ),
+        migrations.AlterField(
+            model_name='sessiontracker',
+            name='violation_details',
+            field=models.JSONField(blank=True, default=list, help_text='JSON list containing violation details'),
+        ),
+    ]
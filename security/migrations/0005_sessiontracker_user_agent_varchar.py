@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-16 08:28
+
+from django.db import migrations, models
+from django.db.models.functions import Length, Substr
+
+
+def truncate_user_agents(apps, schema_editor):
+    """
+    Trim stored user agents to the new column length, which the middleware
+    already applies to every session it records.
+    """
+    SessionTracker = apps.get_model('security', 'SessionTracker')
+    SessionTracker.objects.annotate(
+        user_agent_length=Length('user_agent')
+    ).filter(user_agent_length__gt=500).update(user_agent=Substr('user_agent', 1, 500))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0004_json_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(truncate_user_agents, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='sessiontracker',
+            name='user_agent',
+            field=models.CharField(blank=True, help_text='Browser user agent string', max_length=500),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-16 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('security', '0005_sessiontracker_user_agent_varchar'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sessiontracker',
+            index=models.Index(fields=['user', 'login_time'], name='sess_user_login_idx'),
+        ),
+    ]
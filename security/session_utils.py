@@ -6,14 +6,17 @@ sessions, and handling session cleanup operations.
 """
 
 import logging
+import time
 from datetime import timedelta
+from importlib import import_module
 from django.conf import settings
 from django.contrib.auth import logout
 from django.contrib.sessions.models import Session
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from django.utils import timezone
-from django.db import transaction
-from .models import SessionTracker
+from django.db import DatabaseError, transaction
+from django.db.models import Avg, Count, F, Q
+from .models import SessionTracker, forget_cached_trackers
 
 
 logger = logging.getLogger(__name__)
@@ -27,9 +30,27 @@ class SessionManager:
     # Cache timeout for session data (in seconds)
     CACHE_TIMEOUT = 300  # 5 minutes
     
+    # Generation number embedded in session count and statistics cache keys;
+    # bumping it invalidates them all without touching other cache entries
+    CACHE_GENERATION_KEY = 'session_cache_gen'
+    
+    # Statistics are polled by dashboards and may be this many seconds stale
+    STATS_CACHE_TIMEOUT = 60
+    
     # Maximum concurrent sessions per user (configurable via settings)
     MAX_CONCURRENT_SESSIONS = getattr(settings, 'MAX_CONCURRENT_SESSIONS', 1)
     
+    # Maximum rows deleted per transaction during cleanup
+    CLEANUP_BATCH_SIZE = 10000
+    
+    # User-facing text for each session notification type
+    NOTIFICATION_MESSAGES = {
+        'concurrent_session_denied': 'Login attempt denied. You already have an active session on another device.',
+        'session_terminated': 'Your session was terminated due to a new login from another device.',
+        'session_timeout': 'Your session expired due to inactivity.',
+        'admin_logout': 'Your session was terminated by an administrator.',
+    }
+    
     @classmethod
     def get_active_sessions_for_user(cls, user):
         """
@@ -39,13 +60,14 @@ class SessionManager:
             user (User): User object
             
         Returns:
-            QuerySet: Active SessionTracker objects for the user
+            QuerySet: Active SessionTracker objects for the user (callers
+            that display the device should add select_related('device'))
         """
         return SessionTracker.objects.filter(
             user=user,
             status='active',
             logout_time__isnull=True
-        ).select_related('device')
+        )
     
     @classmethod
     def get_session_count_for_user(cls, user):
@@ -58,7 +80,7 @@ class SessionManager:
         Returns:
             int: Number of active sessions
         """
-        cache_key = f"session_count_{user.id}"
+        cache_key = cls._session_count_cache_key(user.id)
         count = cache.get(cache_key)
         
         if count is None:
@@ -81,8 +103,27 @@ class SessionManager:
         if not user or not user.is_authenticated:
             return False
         
-        active_sessions = cls.get_session_count_for_user(user)
-        return active_sessions < cls.MAX_CONCURRENT_SESSIONS
+        return not cls.has_reached_session_limit(user)
+    
+    @classmethod
+    def has_reached_session_limit(cls, user):
+        """
+        Check if a user already has MAX_CONCURRENT_SESSIONS active sessions.
+        
+        Only up to the limit is counted, so the query can stop early instead
+        of counting every active session.
+        
+        Args:
+            user (User): User object
+            
+        Returns:
+            bool: True if the limit has been reached, False otherwise
+        """
+        limit = cls.MAX_CONCURRENT_SESSIONS
+        active_sessions = cls.get_active_sessions_for_user(user).order_by()
+        if limit == 1:
+            return active_sessions.exists()
+        return active_sessions.values('pk')[:limit].count() >= limit
     
     @classmethod
     def end_oldest_session_for_user(cls, user, reason='new_session_limit'):
@@ -97,17 +138,25 @@ class SessionManager:
             bool: True if a session was ended, False otherwise
         """
         try:
-            oldest_session = cls.get_active_sessions_for_user(user).order_by('login_time').first()
+            with transaction.atomic():
+                # Lock the row, so two logins racing under the same limit
+                # cannot both end it; the other one moves on to the next row
+                oldest_session = cls.get_active_sessions_for_user(user).only(
+                    'id', 'session_key'
+                ).order_by('login_time').select_for_update(skip_locked=True).first()
+                
+                if oldest_session:
+                    # Same effect as end_session(reason)
+                    SessionTracker.objects.filter(pk=oldest_session.pk).update(
+                        status=SessionTracker.END_REASON_STATUS.get(reason, 'inactive'),
+                        logout_time=timezone.now()
+                    )
+                    
+                    # Also invalidate the Django session (a no-op if it is already gone)
+                    Session.objects.filter(session_key=oldest_session.session_key).delete()
             
             if oldest_session:
-                oldest_session.end_session(reason)
-                
-                # Also invalidate the Django session
-                try:
-                    django_session = Session.objects.get(session_key=oldest_session.session_key)
-                    django_session.delete()
-                except Session.DoesNotExist:
-                    pass
+                cls.evict_cached_sessions([oldest_session.session_key])
                 
                 # Clear cache
                 cls._clear_user_session_cache(user)
@@ -115,7 +164,7 @@ class SessionManager:
                 logger.info(f"Ended oldest session for user {user.username}: {oldest_session.session_key}")
                 return True
                 
-        except Exception as e:
+        except DatabaseError as e:
             logger.error(f"Error ending oldest session for user {user.username}: {e}")
         
         return False
@@ -140,19 +189,23 @@ class SessionManager:
                 active_sessions = active_sessions.exclude(session_key=exclude_session)
             
             ended_count = 0
-            
-            with transaction.atomic():
-                for session_tracker in active_sessions:
-                    session_tracker.end_session(reason)
-                    
-                    # Also invalidate the Django session
-                    try:
-                        django_session = Session.objects.get(session_key=session_tracker.session_key)
-                        django_session.delete()
-                    except Session.DoesNotExist:
-                        pass
-                    
-                    ended_count += 1
+            ended_keys = []
+            
+            # Fetch only ids and session keys, then end every tracker with one
+            # UPDATE (same effect as end_session(reason)) and delete the
+            # matching Django sessions with one DELETE
+            session_rows = list(active_sessions.order_by().values_list('id', 'session_key'))
+            if session_rows:
+                tracker_ids, ended_keys = zip(*session_rows)
+                with transaction.atomic():
+                    ended_count = SessionTracker.objects.filter(id__in=tracker_ids).update(
+                        status=SessionTracker.END_REASON_STATUS.get(reason, 'inactive'),
+                        logout_time=timezone.now()
+                    )
+                    sessions = Session.objects.filter(session_key__in=ended_keys)
+                    sessions._raw_delete(sessions.db)
+            
+            cls.evict_cached_sessions(ended_keys)
             
             # Clear cache
             cls._clear_user_session_cache(user)
@@ -160,7 +213,7 @@ class SessionManager:
             logger.info(f"Ended {ended_count} sessions for user {user.username}")
             return ended_count
             
-        except Exception as e:
+        except DatabaseError as e:
             logger.error(f"Error ending sessions for user {user.username}: {e}")
             return 0
     
@@ -225,7 +278,7 @@ class SessionManager:
             # Store for 1 hour
             cache.set(cache_key, notification_data, timeout=3600)
             
-        except Exception as e:
+        except DatabaseError as e:
             logger.error(f"Error creating session notification: {e}")
     
     @classmethod
@@ -254,51 +307,81 @@ class SessionManager:
         cache.delete(cache_key)
     
     @classmethod
-    def cleanup_expired_sessions(cls, timeout_minutes=None):
+    def cleanup_expired_sessions(cls, timeout_minutes=None, batch_size=None):
         """
         Clean up expired sessions and session trackers.
         
         Args:
             timeout_minutes (int): Session timeout in minutes
+            batch_size (int): Maximum rows deleted per transaction
             
         Returns:
             dict: Cleanup statistics
         """
         if timeout_minutes is None:
             timeout_minutes = getattr(settings, 'SESSION_TIMEOUT_MINUTES', 30)
+        if batch_size is None:
+            batch_size = cls.CLEANUP_BATCH_SIZE
         
-        cutoff_time = timezone.now() - timedelta(minutes=timeout_minutes)
+        now = timezone.now()
+        cutoff_time = now - timedelta(minutes=timeout_minutes)
         
         try:
             # Find expired session trackers
             expired_sessions = SessionTracker.objects.filter(
                 status='active',
                 last_activity__lt=cutoff_time
-            )
+            ).order_by()
             
             expired_count = 0
             django_sessions_cleaned = 0
             
-            with transaction.atomic():
-                for session_tracker in expired_sessions:
-                    # End the session tracker
-                    session_tracker.end_session('timeout')
-                    expired_count += 1
+            # Fetch only ids and session keys, a batch at a time, and end each
+            # batch with one UPDATE (same effect as end_session('timeout')).
+            # Ended trackers drop out of the filter, so every pass starts fresh.
+            while True:
+                batch_rows = list(
+                    expired_sessions.values_list('id', 'session_key')[:batch_size]
+                )
+                if not batch_rows:
+                    break
+                
+                tracker_ids, session_keys = zip(*batch_rows)
+                with transaction.atomic():
+                    expired_count += SessionTracker.objects.filter(id__in=tracker_ids).update(
+                        status='expired',
+                        logout_time=now
+                    )
                     
-                    # Clean up Django session
-                    try:
-                        django_session = Session.objects.get(session_key=session_tracker.session_key)
-                        django_session.delete()
-                        django_sessions_cleaned += 1
-                    except Session.DoesNotExist:
-                        pass
-            
-            # Clean up orphaned Django sessions (sessions without trackers)
+                    # Clean up the matching Django sessions
+                    sessions = Session.objects.filter(session_key__in=session_keys)
+                    django_sessions_cleaned += sessions._raw_delete(sessions.db)
+                cls.evict_cached_sessions(session_keys)
+                
+                if len(batch_rows) < batch_size:
+                    break
+            
+            # Clean up orphaned Django sessions (sessions without trackers).
+            # Session has no delete signals or cascades, so a raw DELETE both
+            # removes the rows and reports the count. Rows are deleted in
+            # batches, each in its own transaction, to bound lock and WAL size.
             orphaned_sessions = Session.objects.filter(
-                expire_date__lt=timezone.now()
+                expire_date__lt=now
             )
-            orphaned_count = orphaned_sessions.count()
-            orphaned_sessions.delete()
+            orphaned_count = 0
+            while True:
+                batch_keys = list(
+                    orphaned_sessions.values_list('session_key', flat=True)[:batch_size]
+                )
+                if not batch_keys:
+                    break
+                
+                batch = Session.objects.filter(session_key__in=batch_keys)
+                with transaction.atomic():
+                    orphaned_count += batch._raw_delete(batch.db)
+                
+                if len(batch_keys) < batch_size:
+                    break
             
             # Clear all session count caches
             cls._clear_all_session_caches()
@@ -313,7 +396,7 @@ class SessionManager:
             logger.info(f"Session cleanup completed: {stats}")
             return stats
             
-        except Exception as e:
+        except DatabaseError as e:
             logger.error(f"Error during session cleanup: {e}")
             return {'error': str(e)}
     
@@ -322,110 +405,128 @@ class SessionManager:
         """
         Get comprehensive session statistics.
         
+        Results are cached for STATS_CACHE_TIMEOUT seconds, and dropped along
+        with the session counts whenever expired sessions are cleaned up.
+        
         Returns:
             dict: Session statistics
         """
         try:
-            now = timezone.now()
-            today = now.date()
-            
-            stats = {
-                'total_active_sessions': SessionTracker.objects.filter(
-                    status='active',
-                    logout_time__isnull=True
-                ).count(),
-                
-                'total_sessions_today': SessionTracker.objects.filter(
-                    login_time__date=today
-                ).count(),
-                
-                'unique_users_today': SessionTracker.objects.filter(
-                    login_time__date=today
-                ).values('user').distinct().count(),
-                
-                'violations_today': SessionTracker.objects.filter(
-                    login_time__date=today,
-                    violation_count__gt=0
-                ).count(),
-                
-                'concurrent_violations_today': SessionTracker.objects.filter(
-                    login_time__date=today,
-                    violations__contains='concurrent_session'
-                ).count(),
-                
-                'average_session_duration': cls._calculate_average_session_duration(),
-            }
-            
-            return stats
+            return cache.get_or_set(
+                f"session_stats_{cls._session_cache_generation()}",
+                cls._compute_session_statistics,
+                timeout=cls.STATS_CACHE_TIMEOUT
+            )
             
-        except Exception as e:
+        except DatabaseError as e:
             logger.error(f"Error getting session statistics: {e}")
             return {}
     
+    @classmethod
+    def _compute_session_statistics(cls):
+        """
+        Compute session statistics from the database.
+        """
+        today = SessionTracker.logged_in_today()
+        violated_today = today & Q(violation_count__gt=0)
+        week_ago = timezone.now() - timedelta(days=7)
+        
+        # All figures in one query, as conditional aggregates
+        stats = SessionTracker.objects.aggregate(
+            total_active_sessions=Count(
+                'id', filter=Q(status='active', logout_time__isnull=True)
+            ),
+            total_sessions_today=Count('id', filter=today),
+            unique_users_today=Count('user', filter=today, distinct=True),
+            violations_today=Count('id', filter=violated_today),
+            # Matches the serialized {"type": "concurrent_session", ...} records
+            concurrent_violations_today=Count('id', filter=violated_today & Q(
+                violation_details__icontains='"concurrent_session"'
+            )),
+            # Sessions completed in the last 7 days
+            average_duration=Avg(
+                F('logout_time') - F('login_time'),
+                filter=Q(logout_time__isnull=False, login_time__gte=week_ago)
+            ),
+        )
+        
+        average_duration = stats.pop('average_duration')
+        stats['average_session_duration'] = (
+            int(average_duration.total_seconds() / 60) if average_duration else 0  # In minutes
+        )
+        
+        return stats
+    
     @classmethod
     def _get_notification_message(cls, notification_type, session_tracker):
         """
         Get notification message based on type.
         """
-        messages = {
-            'concurrent_session_denied': 'Login attempt denied. You already have an active session on another device.',
-            'session_terminated': 'Your session was terminated due to a new login from another device.',
-            'session_timeout': 'Your session expired due to inactivity.',
-            'admin_logout': 'Your session was terminated by an administrator.',
-        }
+        return cls.NOTIFICATION_MESSAGES.get(notification_type, 'Session notification')
+    
+    @classmethod
+    def evict_cached_sessions(cls, session_keys):
+        """
+        Drop ended sessions from the session cache and the tracker cache.
+        
+        Cache-backed session engines keep their own copy of each session, so
+        deleting the database row alone leaves the session usable until the
+        cached copy expires. SessionValidationMiddleware likewise keeps a copy
+        of each active tracker row.
+        
+        Args:
+            session_keys (iterable): Keys of the ended sessions
+        """
+        forget_cached_trackers(session_keys)
         
-        return messages.get(notification_type, 'Session notification')
+        session_store = import_module(settings.SESSION_ENGINE).SessionStore
+        prefix = getattr(session_store, 'cache_key_prefix', None)
+        if prefix is None:
+            return
+        
+        cache_keys = [prefix + session_key for session_key in session_keys if session_key]
+        if cache_keys:
+            caches[settings.SESSION_CACHE_ALIAS].delete_many(cache_keys)
     
     @classmethod
     def _clear_user_session_cache(cls, user):
         """
         Clear session-related cache for a specific user.
         """
-        cache_keys = [
-            f"session_count_{user.id}",
+        cache.delete_many([
+            cls._session_count_cache_key(user.id),
             f"session_notification_{user.id}",
-        ]
-        
-        for key in cache_keys:
-            cache.delete(key)
+        ])
     
     @classmethod
     def _clear_all_session_caches(cls):
         """
         Clear all session-related caches.
+        
+        Only the generation is bumped; entries of older generations are no
+        longer looked up and simply expire.
         """
-        # This is a simplified approach - in production, you might want
-        # to use cache versioning or more sophisticated cache management
         try:
-            cache.clear()
-        except Exception as e:
-            logger.error(f"Error clearing session caches: {e}")
+            cache.incr(cls.CACHE_GENERATION_KEY)
+        except ValueError:
+            # The generation itself was evicted, so start a fresh one
+            cache.set(cls.CACHE_GENERATION_KEY, time.time_ns(), timeout=None)
     
     @classmethod
-    def _calculate_average_session_duration(cls):
+    def _session_cache_generation(cls):
         """
-        Calculate average session duration for completed sessions.
+        Get the current session cache generation.
         """
-        try:
-            from django.db.models import Avg, F
-            
-            # Calculate for sessions completed in the last 7 days
-            week_ago = timezone.now() - timedelta(days=7)
-            
-            avg_duration = SessionTracker.objects.filter(
-                logout_time__isnull=False,
-                login_time__gte=week_ago
-            ).aggregate(
-                avg_duration=Avg(F('logout_time') - F('login_time'))
-            )['avg_duration']
-            
-            if avg_duration:
-                return int(avg_duration.total_seconds() / 60)  # Return in minutes
-            
-        except Exception as e:
-            logger.error(f"Error calculating average session duration: {e}")
-        
-        return 0
+        # A time-based starting generation avoids reusing the numbers of a
+        # generation that was evicted from cache
+        return cache.get_or_set(cls.CACHE_GENERATION_KEY, time.time_ns, timeout=None)
+    
+    @classmethod
+    def _session_count_cache_key(cls, user_id):
+        """
+        Build the current generation's session count cache key for a user.
+        """
+        return f"session_count_{cls._session_cache_generation()}_{user_id}"
 
 
 class SessionSecurityMonitor:
@@ -447,12 +548,14 @@ class SessionSecurityMonitor:
         suspicious_activities = []
         
         try:
+            recent_logins = cls._get_recent_login_counts(session_tracker.user_id)
+            
             # Check for rapid login attempts
-            if cls._has_rapid_login_attempts(session_tracker.user):
+            if cls._has_rapid_login_attempts(recent_logins):
                 suspicious_activities.append('rapid_login_attempts')
             
             # Check for unusual IP address patterns
-            if cls._has_unusual_ip_pattern(session_tracker):
+            if cls._has_unusual_ip_pattern(recent_logins):
                 suspicious_activities.append('unusual_ip_pattern')
             
             # Check for session duration anomalies
@@ -463,60 +566,52 @@ class SessionSecurityMonitor:
             if session_tracker.violation_count > 5:
                 suspicious_activities.append('excessive_violations')
             
-        except Exception as e:
+        except DatabaseError as e:
             logger.error(f"Error detecting suspicious activity: {e}")
         
         return suspicious_activities
     
     @classmethod
-    def _has_rapid_login_attempts(cls, user):
+    def _get_recent_login_counts(cls, user_id):
+        """
+        Count a user's recent logins and login IPs in a single query.
+        
+        Returns:
+            dict: 'last_10_minutes' logins and 'distinct_ips' over 24 hours
+        """
+        now = timezone.now()
+        return SessionTracker.objects.filter(
+            user_id=user_id,
+            login_time__gte=now - timedelta(hours=24)
+        ).aggregate(
+            last_10_minutes=Count('id', filter=Q(login_time__gte=now - timedelta(minutes=10))),
+            distinct_ips=Count('ip_address', distinct=True),
+        )
+    
+    @classmethod
+    def _has_rapid_login_attempts(cls, recent_logins):
         """
         Check for rapid login attempts from the same user.
         """
-        try:
-            # Check for more than 5 login attempts in the last 10 minutes
-            ten_minutes_ago = timezone.now() - timedelta(minutes=10)
-            
-            recent_sessions = SessionTracker.objects.filter(
-                user=user,
-                login_time__gte=ten_minutes_ago
-            ).count()
-            
-            return recent_sessions > 5
-            
-        except Exception:
-            return False
+        # More than 5 login attempts in the last 10 minutes
+        return recent_logins['last_10_minutes'] > 5
     
     @classmethod
-    def _has_unusual_ip_pattern(cls, session_tracker):
+    def _has_unusual_ip_pattern(cls, recent_logins):
         """
         Check for unusual IP address patterns.
         """
-        try:
-            # Check if user has logged in from different IP addresses recently
-            recent_ips = SessionTracker.objects.filter(
-                user=session_tracker.user,
-                login_time__gte=timezone.now() - timedelta(hours=24)
-            ).values_list('ip_address', flat=True).distinct()
-            
-            # Flag if more than 3 different IPs in 24 hours
-            return len(recent_ips) > 3
-            
-        except Exception:
-            return False
+        # Flag if more than 3 different IPs in 24 hours
+        return recent_logins['distinct_ips'] > 3
     
     @classmethod
     def _has_unusual_session_duration(cls, session_tracker):
         """
         Check for unusual session duration patterns.
         """
-        try:
-            # If session is still active and has been running for more than 12 hours
-            if session_tracker.status == 'active':
-                duration = timezone.now() - session_tracker.login_time
-                return duration.total_seconds() > 12 * 3600  # 12 hours
-            
-        except Exception:
-            pass
+        # If session is still active and has been running for more than 12 hours
+        if session_tracker.status == 'active':
+            duration = timezone.now() - session_tracker.login_time
+            return duration.total_seconds() > 12 * 3600  # 12 hours
         
         return False
\ No newline at end of file
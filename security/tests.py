@@ -1,10 +1,13 @@
 import json
 from datetime import timedelta
 from django.test import TestCase, RequestFactory, Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.contrib.auth.models import User
 from django.contrib.sessions.middleware import SessionMiddleware
 from django.contrib.auth.middleware import AuthenticationMiddleware
 from django.contrib.messages.middleware import MessageMiddleware
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.urls import reverse
@@ -12,7 +15,7 @@ from unittest.mock import patch, MagicMock
 
 from users.models import UserProfile
 from devices.models import Device
-from .models import AccessControl, SessionTracker
+from .models import AccessControl, SessionTracker, tracker_cache_key
 from .middleware import SessionValidationMiddleware, AccessControlMiddleware
 from .utils import (
     get_active_sessions_count, 
@@ -107,7 +110,7 @@ class SessionValidationMiddlewareTest(TestCase):
         request = self._create_request_with_session()
         
         # Mock device retrieval
-        with patch.object(self.middleware, '_get_user_device', return_value=self.device):
+        with patch.object(self.middleware, '_get_user_device_id', return_value=self.device.id):
             response = self.middleware.process_request(request)
         
         self.assertIsNone(response)
@@ -921,6 +924,287 @@ class SessionSecurityMonitorTest(TestCase):
         self.assertIn('rapid_login_attempts', suspicious_activities)
 
 
+class AccessControlModelTest(TestCase):
+    """
+    Test cases for AccessControl JSON field helpers.
+    """
+    
+    def test_getters_follow_field_changes(self):
+        """
+        Test that derived lookups track reassigned field values.
+        """
+        access_control = AccessControl(allowed_domains=['example.com'])
+        self.assertTrue(access_control.is_domain_allowed('example.com'))
+        
+        # Direct assignment (as forms and the admin do) is picked up
+        access_control.allowed_domains = ['other.com']
+        self.assertFalse(access_control.is_domain_allowed('example.com'))
+        
+        access_control.set_blocked_domains(['other.com'])
+        self.assertFalse(access_control.is_domain_allowed('other.com'))
+        self.assertEqual(access_control.blocked_domains, ['other.com'])
+    
+    def test_getters_return_copies(self):
+        """
+        Test that mutating a returned list does not change the rule.
+        """
+        access_control = AccessControl(allowed_domains=['example.com'])
+        access_control.get_allowed_domains().append('other.com')
+        
+        self.assertEqual(access_control.get_allowed_domains(), ['example.com'])
+        self.assertFalse(access_control.is_domain_allowed('other.com'))
+    
+    def test_json_text_is_stored_parsed(self):
+        """
+        Test that JSON text assigned to a field is saved as the parsed value.
+        """
+        admin_user = User.objects.create_user(username='admin', password='adminpass123')
+        AccessControl.objects.create(
+            role='student',
+            created_by=admin_user,
+            allowed_domains='["example.com"]',
+            time_restrictions='{"days": ["monday"]}'
+        )
+        
+        access_control = AccessControl.objects.get(role='student')
+        self.assertEqual(access_control.allowed_domains, ['example.com'])
+        self.assertEqual(access_control.time_restrictions, {'days': ['monday']})
+    
+    def test_resave_of_active_rule_skips_deactivation(self):
+        """
+        Test that re-saving an active rule does not deactivate other rules again.
+        """
+        admin_user = User.objects.create_user(username='admin', password='adminpass123')
+        AccessControl.objects.create(role='student', created_by=admin_user)
+        access_control = AccessControl.objects.get(role='student')
+        
+        with CaptureQueriesContext(connection) as ctx:
+            access_control.save()
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)  # only the row itself
+
+
+class SessionTrackerModelTest(TestCase):
+    """
+    Test cases for SessionTracker model methods.
+    """
+    
+    def setUp(self):
+        """
+        Set up test data.
+        """
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.device = Device.objects.create(
+            user=self.user,
+            registered_by=self.user,
+            name='Test Device',
+            device_type='laptop',
+            mac_address='00:11:22:33:44:55',
+            operating_system='windows',
+            compliance_status=True
+        )
+    
+    def test_cleanup_expired_sessions(self):
+        """
+        Test that idle active sessions are expired in bulk.
+        """
+        for i in range(3):
+            SessionTracker.objects.create(
+                user=self.user,
+                device=self.device,
+                session_key=f'session_{i}',
+                ip_address='127.0.0.1',
+                status='active'
+            )
+        SessionTracker.objects.filter(session_key__in=['session_0', 'session_1']).update(
+            last_activity=timezone.now() - timedelta(minutes=45)
+        )
+        
+        self.assertEqual(SessionTracker.cleanup_expired_sessions(timeout_minutes=30), 2)
+        
+        expired = SessionTracker.objects.filter(status='expired')
+        self.assertEqual(expired.count(), 2)
+        self.assertFalse(expired.filter(logout_time__isnull=True).exists())
+        self.assertEqual(SessionTracker.objects.get(session_key='session_2').status, 'active')
+    
+    def test_update_activity_is_a_single_update(self):
+        """
+        Test that partial saves skip model validation queries.
+        """
+        session_tracker = SessionTracker.objects.create(
+            user=self.user,
+            device=self.device,
+            session_key='session_key',
+            ip_address='127.0.0.1',
+            status='active'
+        )
+        
+        with self.assertNumQueries(1):
+            session_tracker.update_activity()
+    
+    def test_add_violation_keeps_concurrent_records(self):
+        """
+        Test that violations recorded through a stale instance are appended.
+        """
+        session_tracker = SessionTracker.objects.create(
+            user=self.user,
+            device=self.device,
+            session_key='session_key',
+            ip_address='127.0.0.1',
+            status='active'
+        )
+        stale_copy = SessionTracker.objects.get(pk=session_tracker.pk)
+        
+        session_tracker.add_violations([('first', None), ('second', {'path': '/'})])
+        stale_copy.add_violation('third')
+        
+        session_tracker.refresh_from_db()
+        self.assertEqual(session_tracker.violation_count, 3)
+        self.assertEqual(
+            [violation['type'] for violation in session_tracker.get_violations()],
+            ['first', 'second', 'third']
+        )
+    
+    def test_active_sessions_listing_is_one_query(self):
+        """
+        Test that listing active sessions does not query per user and device.
+        """
+        for i in range(3):
+            SessionTracker.objects.create(
+                user=self.user,
+                device=self.device,
+                session_key=f'session_{i}',
+                ip_address='127.0.0.1',
+                status='active'
+            )
+        
+        with self.assertNumQueries(1):
+            labels = [str(session) for session in SessionTracker.get_active_sessions()]
+        self.assertEqual(len(labels), 3)
+    
+    def test_end_all_sessions_for_user(self):
+        """
+        Test that a user's sessions are ended together, keeping the excluded one.
+        """
+        for i in range(3):
+            SessionTracker.objects.create(
+                user=self.user,
+                device=self.device,
+                session_key=f'session_{i}',
+                ip_address='127.0.0.1',
+                status='active'
+            )
+        
+        ended = SessionManager.end_all_sessions_for_user(
+            self.user, reason='violation', exclude_session='session_2'
+        )
+        
+        self.assertEqual(ended, 2)
+        self.assertEqual(
+            set(SessionTracker.objects.filter(status='violation').values_list('session_key', flat=True)),
+            {'session_0', 'session_1'}
+        )
+        self.assertEqual(SessionTracker.objects.get(session_key='session_2').status, 'active')
+    
+    def test_clearing_session_caches_keeps_other_entries(self):
+        """
+        Test that session counts are invalidated without clearing the cache.
+        """
+        cache.set('unrelated_key', 'value')
+        self.assertEqual(SessionManager.get_session_count_for_user(self.user), 0)
+        SessionTracker.objects.create(
+            user=self.user,
+            device=self.device,
+            session_key='session_key',
+            ip_address='127.0.0.1',
+            status='active'
+        )
+        
+        SessionManager._clear_all_session_caches()
+        
+        self.assertEqual(SessionManager.get_session_count_for_user(self.user), 1)
+        self.assertEqual(cache.get('unrelated_key'), 'value')
+    
+    def test_bulk_ending_sessions_drops_cached_trackers(self):
+        """
+        Test that trackers ended in bulk are removed from the tracker cache.
+        """
+        for i in range(3):
+            SessionTracker.objects.create(
+                user=self.user,
+                device=self.device,
+                session_key=f'session_{i}',
+                ip_address='127.0.0.1',
+                status='active'
+            )
+            cache.set(tracker_cache_key(f'session_{i}'), 'cached')
+        SessionTracker.objects.filter(session_key='session_0').update(
+            last_activity=timezone.now() - timedelta(minutes=45)
+        )
+        
+        SessionTracker.cleanup_expired_sessions(timeout_minutes=30)
+        self.assertIsNone(cache.get(tracker_cache_key('session_0')))
+        self.assertEqual(cache.get(tracker_cache_key('session_1')), 'cached')
+        
+        SessionManager.end_all_sessions_for_user(self.user, exclude_session='session_2')
+        self.assertIsNone(cache.get(tracker_cache_key('session_1')))
+        self.assertEqual(cache.get(tracker_cache_key('session_2')), 'cached')
+    
+    def test_session_statistics_count_concurrent_violations(self):
+        """
+        Test that concurrent_session violations are counted from the stored JSON.
+        """
+        trackers = [
+            SessionTracker.objects.create(
+                user=self.user,
+                device=self.device,
+                session_key=f'session_{i}',
+                ip_address='127.0.0.1',
+                status='active'
+            )
+            for i in range(3)
+        ]
+        trackers[0].add_violations([('concurrent_session', {'ip': '10.0.0.1'})])
+        trackers[1].add_violations([
+            ('concurrent_session_denied', {'ip': '10.0.0.2'}),
+            ('access_denied', None),
+        ])
+        
+        stats = SessionManager._compute_session_statistics()
+        
+        self.assertEqual(stats['violations_today'], 2)
+        self.assertEqual(stats['concurrent_violations_today'], 1)
+    
+    def test_concurrent_session_created_behind_cache_is_detected(self):
+        """
+        Test that a tracker created outside the middleware counts as concurrent.
+        """
+        middleware = SessionValidationMiddleware(get_response=lambda r: None)
+        SessionTracker.objects.create(
+            user=self.user,
+            device=self.device,
+            session_key='first_session',
+            ip_address='127.0.0.1',
+            status='active'
+        )
+        self.assertFalse(middleware._has_concurrent_sessions(self.user, 'first_session'))
+        
+        # As another worker would, without touching this process's cache
+        SessionTracker.objects.create(
+            user=self.user,
+            device=self.device,
+            session_key='second_session',
+            ip_address='127.0.0.2',
+            status='active'
+        )
+        
+        self.assertTrue(middleware._has_concurrent_sessions(self.user, 'first_session'))
+
+
 class AccessControlFormTest(TestCase):
     """
     Test cases for AccessControlForm.
@@ -6,7 +6,9 @@ import logging
 from django.contrib.sessions.models import Session
 from django.utils import timezone
 from django.core.cache import cache
+from django.db.models import Count, Q
 from .models import SessionTracker
+from .session_utils import SessionManager
 
 
 logger = logging.getLogger(__name__)
@@ -50,22 +52,10 @@ def terminate_user_sessions(user, exclude_session_key=None):
         exclude_session_key: Session key to exclude from termination
     """
     try:
-        sessions = get_user_active_sessions(user)
-        
-        if exclude_session_key:
-            sessions = sessions.exclude(session_key=exclude_session_key)
-        
-        count = 0
-        for session in sessions:
-            session.end_session('admin_action')
-            
-            # Also delete the Django session
-            try:
-                Session.objects.filter(session_key=session.session_key).delete()
-            except Exception:
-                pass  # Session might already be deleted
-            
-            count += 1
+        # Ends the trackers and deletes their Django sessions in bulk
+        count = SessionManager.end_all_sessions_for_user(
+            user, reason='admin_action', exclude_session=exclude_session_key
+        )
         
         logger.info(f"Terminated {count} sessions for user {user.username}")
         return count
@@ -111,23 +101,11 @@ def cleanup_expired_sessions(timeout_minutes=30):
         int: Number of sessions cleaned up
     """
     try:
-        cutoff_time = timezone.now() - timezone.timedelta(minutes=timeout_minutes)
-        
-        expired_sessions = SessionTracker.objects.filter(
-            status='active',
-            last_activity__lt=cutoff_time,
-            logout_time__isnull=True
-        )
+        # Expire idle trackers in one UPDATE rather than a save() per session
+        count = SessionTracker.cleanup_expired_sessions(timeout_minutes=timeout_minutes)
         
-        count = 0
-        for session in expired_sessions:
-            session.end_session('timeout')
-            count += 1
-        
-        # Also cleanup Django sessions
-        django_expired = Session.objects.filter(expire_date__lt=timezone.now())
-        django_count = django_expired.count()
-        django_expired.delete()
+        # Also cleanup Django sessions; delete() reports how many rows it removed
+        django_count, _ = Session.objects.filter(expire_date__lt=timezone.now()).delete()
         
         logger.info(f"Cleaned up {count} session trackers and {django_count} Django sessions")
         return count + django_count
@@ -145,33 +123,17 @@ def get_session_statistics():
         dict: Session statistics
     """
     try:
-        now = timezone.now()
-        today = now.date()
-        
-        stats = {
-            'active_sessions': SessionTracker.objects.filter(
-                status='active',
-                logout_time__isnull=True
-            ).count(),
-            'total_sessions_today': SessionTracker.objects.filter(
-                login_time__date=today
-            ).count(),
-            'violations_today': SessionTracker.objects.filter(
-                login_time__date=today,
-                violation_count__gt=0
-            ).count(),
-            'unique_users_today': SessionTracker.objects.filter(
-                login_time__date=today
-            ).values('user').distinct().count(),
-            'expired_sessions': SessionTracker.objects.filter(
-                status='expired'
-            ).count(),
-            'terminated_sessions': SessionTracker.objects.filter(
-                status='terminated'
-            ).count(),
-        }
-        
-        return stats
+        today = SessionTracker.logged_in_today()
+        
+        # All counts in one query, as conditional aggregates
+        return SessionTracker.objects.aggregate(
+            active_sessions=Count('id', filter=Q(status='active', logout_time__isnull=True)),
+            total_sessions_today=Count('id', filter=today),
+            violations_today=Count('id', filter=today & Q(violation_count__gt=0)),
+            unique_users_today=Count('user', filter=today, distinct=True),
+            expired_sessions=Count('id', filter=Q(status='expired')),
+            terminated_sessions=Count('id', filter=Q(status='terminated')),
+        )
         
     except Exception as e:
         logger.error(f"Error getting session statistics: {e}")
@@ -36,6 +36,12 @@ class SecurityValidator:
         r'<embed[^>]*>',             # Embed tags
     ]
     
+    # All malicious patterns as one case-insensitive regex, compiled once
+    MALICIOUS_RE = re.compile(
+        '|'.join(f'(?:{pattern})' for pattern in MALICIOUS_PATTERNS),
+        re.IGNORECASE
+    )
+    
     @classmethod
     def sanitize_text_input(cls, value, max_length=None, allow_html=False):
         """
@@ -59,11 +65,10 @@ class SecurityValidator:
         value = value.replace('\x00', '').replace('\r', '')
         
         # Check for malicious patterns
-        for pattern in cls.MALICIOUS_PATTERNS:
-            if re.search(pattern, value, re.IGNORECASE):
-                raise ValidationError(
-                    'Input contains potentially malicious content and cannot be processed.'
-                )
+        if cls.MALICIOUS_RE.search(value):
+            raise ValidationError(
+                'Input contains potentially malicious content and cannot be processed.'
+            )
         
         # Handle HTML content
         if allow_html:
@@ -291,9 +296,8 @@ class SecurityValidator:
             raise ValidationError(f'JSON data too large. Maximum {max_size} bytes allowed.')
         
         # Check for malicious patterns in JSON string
-        for pattern in cls.MALICIOUS_PATTERNS:
-            if re.search(pattern, value, re.IGNORECASE):
-                raise ValidationError('JSON contains potentially malicious content.')
+        if cls.MALICIOUS_RE.search(value):
+            raise ValidationError('JSON contains potentially malicious content.')
         
         try:
             data = json.loads(value)
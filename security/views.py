@@ -186,10 +186,10 @@ class SessionMonitorView(AdminRequiredMixin, ListView):
         context['total_sessions'] = SessionTracker.objects.count()
         context['active_sessions'] = SessionTracker.get_active_sessions().count()
         context['sessions_today'] = SessionTracker.objects.filter(
-            login_time__date=timezone.now().date()
+            SessionTracker.logged_in_today()
         ).count()
         context['violations_today'] = SessionTracker.objects.filter(
-            login_time__date=timezone.now().date(),
+            SessionTracker.logged_in_today(),
             violation_count__gt=0
         ).count()
         
@@ -253,10 +253,12 @@ class SecurityAlertsView(AdminRequiredMixin, ListView):
     def get_queryset(self):
         """
         Get sessions with security violations.
+        
+        Alerts show violation_count, so the violation history is not loaded.
         """
         queryset = SessionTracker.objects.filter(
             Q(violation_count__gt=0) | Q(status='violation')
-        ).select_related('user', 'device').order_by('-login_time')
+        ).select_related('user', 'device').defer('violation_details').order_by('-login_time')
         
         # Filter by severity (based on violation count)
         severity_filter = self.request.GET.get('severity')
@@ -270,7 +272,7 @@ class SecurityAlertsView(AdminRequiredMixin, ListView):
         # Filter by date
         date_filter = self.request.GET.get('date')
         if date_filter == 'today':
-            queryset = queryset.filter(login_time__date=timezone.now().date())
+            queryset = queryset.filter(SessionTracker.logged_in_today())
         elif date_filter == 'week':
             week_ago = timezone.now() - timezone.timedelta(days=7)
             queryset = queryset.filter(login_time__gte=week_ago)
@@ -314,10 +316,10 @@ def session_stats_api(request):
     stats = {
         'active_sessions': SessionTracker.get_active_sessions().count(),
         'total_sessions_today': SessionTracker.objects.filter(
-            login_time__date=timezone.now().date()
+            SessionTracker.logged_in_today()
         ).count(),
         'violations_today': SessionTracker.objects.filter(
-            login_time__date=timezone.now().date(),
+            SessionTracker.logged_in_today(),
             violation_count__gt=0
         ).count(),
         'users_online': SessionTracker.get_active_sessions().values('user').distinct().count(),
@@ -376,7 +378,7 @@ def manage_user_sessions(request, user_id):
             messages.success(request, f'Ended session for user {user.username}.')
     
     # Get user's active sessions
-    active_sessions = SessionManager.get_active_sessions_for_user(user)
+    active_sessions = SessionManager.get_active_sessions_for_user(user).select_related('device')
     
     context = {
         'target_user': user,
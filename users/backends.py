@@ -0,0 +1,25 @@
+"""
+Authentication backends for the BYOD Security System.
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+UserModel = get_user_model()
+
+
+class ProfileModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the user's profile together with the user.
+    
+    The security middleware reads request.user.profile on every authenticated
+    request, so joining it here saves a query per request.
+    """
+    
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
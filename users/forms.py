@@ -6,6 +6,10 @@ from .models import UserProfile
 from security.validators import SecurityValidator, PasswordSecurityValidator
 
 
+# Role values accepted at registration; ROLE_CHOICES is static
+_VALID_ROLES = frozenset(choice[0] for choice in UserProfile.ROLE_CHOICES)
+
+
 class CustomUserCreationForm(UserCreationForm):
     """
     Custom user registration form with role selection.
@@ -94,9 +98,8 @@ class CustomUserCreationForm(UserCreationForm):
         Validate role selection.
         """
         role = self.cleaned_data.get('role')
-        valid_roles = [choice[0] for choice in UserProfile.ROLE_CHOICES]
         
-        if role not in valid_roles:
+        if role not in _VALID_ROLES:
             raise ValidationError('Please select a valid role.')
         
         return role
@@ -190,9 +190,9 @@ class Command(BaseCommand):
         student_rules, created = AccessControl.objects.get_or_create(
             role='student',
             defaults={
-                'allowed_domains': '["education.com", "khan-academy.org", "coursera.org", "edx.org"]',
-                'blocked_domains': '["facebook.com", "twitter.com", "instagram.com", "tiktok.com", "youtube.com"]',
-                'time_restrictions': '{"start_time": "08:00", "end_time": "17:00", "days": ["monday", "tuesday", "wednesday", "thursday", "friday"]}',
+                'allowed_domains': ["education.com", "khan-academy.org", "coursera.org", "edx.org"],
+                'blocked_domains': ["facebook.com", "twitter.com", "instagram.com", "tiktok.com", "youtube.com"],
+                'time_restrictions': {"start_time": "08:00", "end_time": "17:00", "days": ["monday", "tuesday", "wednesday", "thursday", "friday"]},
                 'created_by': admin_user,
                 'is_active': True,
             }
@@ -204,9 +204,9 @@ class Command(BaseCommand):
         teacher_rules, created = AccessControl.objects.get_or_create(
             role='teacher',
             defaults={
-                'allowed_domains': '["*"]',  # Allow all domains
-                'blocked_domains': '["gambling.com", "adult-content.com"]',
-                'time_restrictions': '{"start_time": "06:00", "end_time": "22:00"}',
+                'allowed_domains': ["*"],  # Allow all domains
+                'blocked_domains': ["gambling.com", "adult-content.com"],
+                'time_restrictions': {"start_time": "06:00", "end_time": "22:00"},
                 'created_by': admin_user,
                 'is_active': True,
             }
@@ -218,9 +218,9 @@ class Command(BaseCommand):
         admin_rules, created = AccessControl.objects.get_or_create(
             role='admin',
             defaults={
-                'allowed_domains': '["*"]',  # Allow all domains
-                'blocked_domains': '[]',  # No blocked domains
-                'time_restrictions': '{}',  # No time restrictions
+                'allowed_domains': ["*"],  # Allow all domains
+                'blocked_domains': [],  # No blocked domains
+                'time_restrictions': {},  # No time restrictions
                 'created_by': admin_user,
                 'is_active': True,
             }
@@ -232,12 +232,12 @@ class Command(BaseCommand):
             
             access_rule = AccessControl.objects.create(
                 role=role,
-                allowed_domains=json.dumps(allowed),
-                blocked_domains=json.dumps(blocked),
-                time_restrictions=json.dumps({
+                allowed_domains=allowed,
+                blocked_domains=blocked,
+                time_restrictions={
                     'weekdays': {'start': '08:00', 'end': '17:00'},
                     'weekends': {'start': '09:00', 'end': '15:00'}
-                }),
+                },
                 created_by=admin_user,
                 is_active=True
             )
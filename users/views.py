@@ -32,23 +32,10 @@ class CustomLoginView(LoginView):
         user = form.get_user()
         
         # Import here to avoid circular imports
-        from security.models import SessionTracker
-        from django.contrib.sessions.models import Session
+        from security.session_utils import SessionManager
         
-        # End all active sessions for this user
-        active_sessions = SessionTracker.objects.filter(
-            user=user,
-            status='active',
-            logout_time__isnull=True
-        )
-        
-        for session_tracker in active_sessions:
-            session_tracker.end_session('new_login')
-            # Also delete the Django session
-            try:
-                Session.objects.filter(session_key=session_tracker.session_key).delete()
-            except:
-                pass
+        # End all active sessions for this user (and their Django sessions)
+        SessionManager.end_all_sessions_for_user(user, reason='new_login')
         
         messages.success(self.request, f'Welcome back, {form.get_user().first_name or form.get_user().username}!')
         return super().form_valid(form)